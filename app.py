@@ -1,216 +1,441 @@
-from flask import Flask, jsonify, send_from_directory, request, abort
-from flask_cors import CORS
-from pdf_service import PDFService, PlaceMapService
-from schedule_service import ScheduleService
-from chat_service import ChatService
-import os
-from dotenv import load_dotenv
-from datetime import datetime
-import os
-
-load_dotenv()  # take environment variables from .env.
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-
-pdf_service = PDFService()
-place_service = PlaceMapService()
-# Init ChatService with API key
-chat_service = ChatService(OPENAI_API_KEY)
-if not OPENAI_API_KEY:
-    raise ValueError("⚠️ OPENAI_API_KEY is not set in environment variables.")
-
-print("API key loaded:", OPENAI_API_KEY[:5] + "...")
-app = Flask(__name__)
-CORS(app)
-
-
-@app.route('/files', methods=['GET'])
-def list_files():
-    return jsonify({'files': pdf_service.fetch_pdf_links()})
-
-@app.route('/download/<filename>', methods=['GET'])
-def download_file(filename):
-    return send_from_directory(pdf_service.download_folder, filename, as_attachment=True)
-
-@app.route('/files/list', methods=['GET'])
-def list_all_files():
-    return jsonify({'files': pdf_service.list_downloaded_pdfs()})
-
-@app.route('/download-all', methods=['GET'])
-def download_all():
-    files = pdf_service.download_pdfs()
-    return jsonify({'status': 'Download complete', 'files': files})
-
-@app.route('/extract/<filename>', methods=['GET'])
-def extract_from_pdf(filename):
-    places = place_service.extract_text_from_pdf(filename)
-    return jsonify({'places': places, 'placesMap': place_service.places_map})
-
-# Configure the directory where your timetables are stored
-PDF_DIR = os.path.join(os.getcwd(), "pdf_downloads")
-
-@app.route('/file/<path:filename>', methods=['GET'])
-def get_file(filename):
-    try:
-        # Make sure the file exists
-        if not os.path.isfile(os.path.join(PDF_DIR, filename)):
-            abort(404, description="File not found")
-
-        # Return file (inline or as download depending on headers)
-        return send_from_directory(
-            directory=PDF_DIR,
-            path=filename,
-            as_attachment=False,   # set to True if you want to force download
-            mimetype="application/pdf"
-        )
-    except Exception as e:
-        abort(500, description=str(e))
-
-
-@app.route('/schedules', methods=['GET'])
-def get_schedule():
-    schedule_service = ScheduleService()
-    # Get user location and destination from query parameters
-    user_location = request.args.get('user_location')
-    dest = request.args.get('destination')
-
-    if not user_location or not dest:
-        return jsonify({"error": "Missing user_location or destination"}), 400
-
-    # Call the method to get times for the given locations
-    times = schedule_service.find_times_for_location_and_destination(user_location, dest)
-    
-    # If times were found, return them in the response, otherwise, return a message
-    if times:
-        return jsonify({"times": times}), 200
-    else:
-        return jsonify({"message": f"No schedule found for {user_location} to {dest}."}), 404
-
-# Create an endpoint to get all places
-@app.route('/places', methods=['GET'])
-def get_all_places():
-    schedule_service = ScheduleService()
-    places = schedule_service.get_all_places()
-
-    if places:
-        return jsonify({"places": places})
-    else:
-        return jsonify({"message": "No places available."}), 404
-    
-# Create an endpoint to get all places
-@app.route('/placesMap', methods=['GET'])
-def get_all_placesMap():
-    schedule_service = ScheduleService()
-    places = {}
-
-    if places:
-        return jsonify({"places": places})
-    else:
-        return jsonify({"message": "No places available."}), 404
-    
-# Create an endpoint to get all routes
-@app.route('/all_routes', methods=['GET'])
-def get_all_Routes():
-    schedule_service = ScheduleService()
-    places = {}
-    places = schedule_service.get_files_list_onsite()
-    if places:
-        return jsonify({"places": places})
-    else:
-        return jsonify({"message": "No places available."}), 404
-
-@app.route("/best-times", methods=["POST"])
-def best_times():
-    try:
-        data = request.json
-        pdf_files = data.get("pdf_files")  # list of file paths
-        time = data.get("time")
-        whereto = data.get("whereto")
-        from_where = data.get("fromWhere")
-
-        if not all([pdf_files, time, whereto, from_where]):
-            missing_fields = "Missing required fields: "
-            if not pdf_files:
-                missing_fields += "pdf_files "
-            if not time:
-                missing_fields += "time "
-            if not whereto:
-                missing_fields += "whereto "
-            if not from_where:
-                missing_fields += "fromWhere "
-
-            return jsonify({"error": missing_fields}), 400
-
-        result = chat_service.get_best_times_from_timetable(
-            pdf_files, time, whereto, from_where
-        )
-        return jsonify({"result": result})
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    
-@app.route("/ask-text", methods=["POST"])
-def ask_text():
-    try:
-        data = request.json
-        prompt = data.get("prompt")
-        history = data.get("history", [])
-
-        if not prompt:
-            return jsonify({"error": "Missing required field: prompt"}), 400
-
-        result = chat_service.ask_gpt_from_text(prompt, history)
-        return jsonify({"response": result})
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
-    
-
-# temporary in-memory store
-crowd_reports = []
-
-@app.route("/crowd-report", methods=["POST"])
-def crowd_report():
-    try:
-        data = request.json
-        report = {
-            "routeId": data.get("routeId"),
-            "stop": data.get("stop"),
-            "status": data.get("status"),
-            "userId": data.get("userId", "anon"),
-            "timestamp": datetime.utcnow().isoformat(),
-            "location": data.get("location"),  # { lat, lng, accuracy }
-        }
-        crowd_reports.append(report)  # 👉 replace with DB insert later
-        return jsonify({"success": True, "report": report}), 201
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
-
-
-@app.route("/crowd-reports", methods=["GET"])
-def get_crowd_reports():
-    try:
-        route_id = request.args.get("routeId")
-        stop = request.args.get("stop")
-
-        # filter results
-        results = crowd_reports
-        if route_id:
-            results = [r for r in results if r["routeId"] == route_id]
-        if stop:
-            results = [r for r in results if r["stop"].lower() == stop.lower()]
-
-        return jsonify({"success": True, "reports": results}), 200
-    except Exception as e:
-        return jsonify({"success": False, "error": str(e)}), 500
-    
-if __name__ == "__main__":
-    import os
-    port = int(os.environ.get("PORT", 5000))  # Render sets PORT env var
-    app.run(host="0.0.0.0", port=port)
-
-    
-
-
-
+from flask import Flask, jsonify, send_file, request, abort, Response, stream_with_context, g
+from flask_cors import CORS
+from pdf_service import PDFService, PlaceMapService
+from schedule_service import ScheduleService
+from chat_service import ChatService
+from crowd_report_service import CrowdReportService, split_filter_values
+from stop_location_service import StopLocationService
+from response_cache import CatalogCache
+from pdf_file_service import PDFFileService
+from render_service import RenderService
+from metrics import REQUEST_SECONDS, configure_logging, registry
+from request_profiler import RequestProfiler, is_admin, profile_path, profiling_requested
+from stop_times import LAST_MINUTE
+from timetable_time import SAST, clock_to_minutes, parse_day_type
+from datetime import datetime
+import logging
+import math
+import os
+import threading
+import time
+from dotenv import load_dotenv
+import os
+
+load_dotenv()  # take environment variables from .env.
+configure_logging()
+logger = logging.getLogger(__name__)
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+
+pdf_service = PDFService()
+place_service = PlaceMapService()
+stop_location_service = StopLocationService()
+catalog_cache = CatalogCache()
+# Init ChatService with API key
+chat_service = ChatService(OPENAI_API_KEY)
+if not OPENAI_API_KEY:
+    raise ValueError("⚠️ OPENAI_API_KEY is not set in environment variables.")
+
+logger.info("API key loaded: %s...", OPENAI_API_KEY[:5])
+app = Flask(__name__)
+CORS(app)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+# Opt-in sampling profile of a single request: X-Profile: 1 (or ?profile=1) plus X-Admin-Token
+@app.before_request
+def start_request_profiler():
+    if profiling_requested(request.headers, request.args):
+        g.profiler = RequestProfiler(f"{request.method} {request.path}").start()
+
+
+@app.after_request
+def finish_request_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        response.headers['X-Profile-File'] = profiler.stop().save()
+        response.headers['X-Profile-Samples'] = str(profiler.samples)
+    return response
+
+
+# Per-route latency histogram; labelled by the URL rule so path parameters don't explode the series
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+    return response
+
+
+# Prometheus scrape target: request and stage latency histograms for this process
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+# Folded stacks written by a profiled request; render with flamegraph.pl or speedscope
+@app.route('/profiles/<name>', methods=['GET'])
+def get_profile(name):
+    path = profile_path(name) if is_admin(request.headers) else None
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
+
+
+@app.route('/files', methods=['GET'])
+def list_files():
+    return jsonify({'files': pdf_service.fetch_pdf_links()})
+
+@app.route('/download/<filename>', methods=['GET'])
+def download_file(filename):
+    return pdf_file_service.send_pdf(filename, request, as_attachment=True)
+
+@app.route('/files/list', methods=['GET'])
+def list_all_files():
+    return jsonify({'files': pdf_service.list_downloaded_pdfs()})
+
+@app.route('/download-all', methods=['GET'])
+def download_all():
+    files = pdf_service.download_pdfs()
+    ScheduleService().get_index(recheck=True)
+    pdf_file_service.load_variants()
+    return jsonify({'status': 'Download complete', 'files': files})
+
+@app.route('/extract/<filename>', methods=['GET'])
+def extract_from_pdf(filename):
+    places = place_service.extract_text_from_pdf(filename)
+    return jsonify({'places': places, 'placesMap': place_service.places_map})
+
+# Configure the directory where your timetables are stored
+PDF_DIR = os.path.join(os.getcwd(), "pdf_downloads")
+pdf_file_service = PDFFileService(PDF_DIR)
+render_service = RenderService(pdf_file_service)
+
+@app.route('/file/<path:filename>', methods=['GET'])
+def get_file(filename):
+    # Inline PDF with content-hash ETag, caching headers and Range support;
+    # a missing file raises 404 from the service
+    return pdf_file_service.send_pdf(filename, request)
+
+
+# Cached artifacts are keyed by the PDF's content hash, so the key is a strong ETag
+def send_cached_artifact(data, mimetype, key):
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(key)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Server-rendered page image, e.g. /render/<file>/page/1?format=webp&width=480
+@app.route('/render/<filename>/page/<int:page>', methods=['GET'])
+def render_page(filename, page):
+    image_format = request.args.get('format', 'png').lower()
+    if image_format not in ('png', 'webp'):
+        return jsonify({"error": "format must be png or webp"}), 400
+    width = request.args.get('width', default=480, type=int)
+    return send_cached_artifact(*render_service.render_page(filename, page, image_format, width))
+
+# Parsed stops and times of one timetable as compact JSON
+@app.route('/table/<filename>', methods=['GET'])
+def get_table_view(filename):
+    return send_cached_artifact(*render_service.table_view(filename))
+
+
+@app.route('/schedules', methods=['GET'])
+def get_schedule():
+    schedule_service = ScheduleService()
+    # Get user location and destination from query parameters
+    user_location = request.args.get('user_location')
+    dest = request.args.get('destination')
+
+    if not user_location or not dest:
+        return jsonify({"error": "Missing user_location or destination"}), 400
+
+    # Call the method to get times for the given locations
+    times = schedule_service.find_times_for_location_and_destination(user_location, dest)
+    
+    # If times were found, return them in the response, otherwise, return a message
+    if times:
+        return jsonify({"times": times}), 200
+    else:
+        return jsonify({"message": f"No schedule found for {user_location} to {dest}."}), 404
+
+# Maximum number of origin/destination pairs accepted by /schedules/batch
+MAX_BATCH_QUERIES = 100
+
+# Batch version of /schedules: {"queries": [{"id", "user_location", "destination", "time"?}, ...]}
+@app.route('/schedules/batch', methods=['POST'])
+def get_schedules_batch():
+    data = request.get_json(silent=True) or {}
+    queries = data.get("queries")
+
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"error": "Missing queries"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+
+    schedule_service = ScheduleService()
+    return jsonify(schedule_service.find_times_batch(queries)), 200
+
+# Create an endpoint to get all places
+@app.route('/places', methods=['GET'])
+def get_all_places():
+    schedule_service = ScheduleService()
+    index = schedule_service.get_index()
+
+    if index.routes:
+        places = catalog_cache.get('places', index.version, lambda: {"places": schedule_service.get_all_places()})
+        return places.to_response(request)
+    else:
+        return jsonify({"message": "No places available."}), 404
+    
+# Create an endpoint to get all places
+@app.route('/placesMap', methods=['GET'])
+def get_all_placesMap():
+    schedule_service = ScheduleService()
+    places = {}
+
+    if places:
+        return jsonify({"places": places})
+    else:
+        return jsonify({"message": "No places available."}), 404
+    
+# Create an endpoint to get all routes
+@app.route('/all_routes', methods=['GET'])
+def get_all_Routes():
+    schedule_service = ScheduleService()
+    index = schedule_service.get_index()
+
+    if index.routes:
+        routes = catalog_cache.get('all_routes', index.version, lambda: {"routes": schedule_service.get_all_routes()})
+        return routes.to_response(request)
+    else:
+        return jsonify({"message": "No routes available."}), 404
+
+# Nearest geocoded stops to a GPS fix, each with its next departures
+@app.route('/stops/nearest', methods=['GET'])
+def get_nearest_stops():
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    k = request.args.get('k', default=5, type=int)
+    radius = request.args.get('radius', default=2000, type=float)
+    departures = request.args.get('departures', default=3, type=int)
+
+    if lat is None or lng is None:
+        return jsonify({"error": "Missing lat or lng"}), 400
+
+    schedule_service = ScheduleService()
+    index = schedule_service.get_index()
+    stop_location_service.ensure_joined(
+        index.version, lambda: {place for route in index.routes for place in route.places})
+
+    stops = stop_location_service.nearest_stops(lat, lng, k=max(1, min(k, 20)), radius_m=radius)
+    for stop in stops:
+        stop['departures'] = schedule_service.get_next_departures(stop['name'], limit=max(0, min(departures, 10)))
+
+    return jsonify({"stops": stops})
+
+# Per-file outcome of the last PDF ingestion: parse time, stop and time counts,
+# warnings, and which files were rejected or quarantined
+@app.route('/ingestion/report', methods=['GET'])
+def get_ingestion_report():
+    report = ScheduleService().get_ingestion_report()
+    if report is None:
+        return jsonify({"message": "The index was not built from PDFs."}), 404
+    return jsonify(report)
+
+# Admin only: lets a quarantined file back into the index once it has been fixed
+@app.route('/ingestion/quarantine/<path:filename>', methods=['DELETE'])
+def release_quarantined_file(filename):
+    if not is_admin(request.headers):
+        abort(404)
+    if not ScheduleService().release_quarantined(filename):
+        return jsonify({"message": f"{filename} is not quarantined."}), 404
+    return jsonify({"released": filename}), 200
+
+# Maximum number of typeahead suggestions per keystroke
+MAX_SUGGESTIONS = 20
+
+# Stop-name typeahead: /stops/suggest?q=khay&limit=8
+@app.route('/stops/suggest', methods=['GET'])
+def suggest_stops():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Missing q"}), 400
+    limit = max(1, min(request.args.get('limit', default=10, type=int), MAX_SUGGESTIONS))
+    return jsonify({"query": query, **ScheduleService().suggest_stops(query, limit)}), 200
+
+# Maximum number of departures listed on one board; counts always cover the whole window
+MAX_BOARD_DEPARTURES = 500
+
+# Departures board: /stops/departures?stop=BELLVILLE&day=saturday&from=07:00&to=08:00
+@app.route('/stops/departures', methods=['GET'])
+def get_departures_board():
+    stop = request.args.get('stop')
+    if not stop:
+        return jsonify({"error": "Missing stop"}), 400
+
+    now = datetime.now(SAST)
+    day = request.args.get('day')
+    day_mask = parse_day_type(day, now)
+    if day_mask is None:
+        return jsonify({"error": f"Invalid day {day}, expected today, weekday, saturday, sunday or any"}), 400
+
+    # Today's board starts now unless asked otherwise; other days start at midnight
+    default_from = f"{now.hour:02d}:{now.minute:02d}" if not day or day.lower() == 'today' else "00:00"
+    start = clock_to_minutes(request.args.get('from', default_from))
+    end = clock_to_minutes(request.args['to']) if request.args.get('to') else LAST_MINUTE
+    if start is None or end is None:
+        return jsonify({"error": "Invalid from/to, expected HH:MM"}), 400
+    limit = max(1, min(request.args.get('limit', default=50, type=int), MAX_BOARD_DEPARTURES))
+
+    board = ScheduleService().get_departures_board(stop, day_mask, start, end, limit)
+    if board is None:
+        return jsonify({"message": f"No stop named {stop}."}), 404
+    return jsonify({"stop": stop.upper(), "day": int(day_mask), "from": start, "to": end, **board}), 200
+
+@app.route("/best-times", methods=["POST"])
+def best_times():
+    try:
+        data = request.json
+        pdf_files = data.get("pdf_files")  # list of file paths
+        time = data.get("time")
+        whereto = data.get("whereto")
+        from_where = data.get("fromWhere")
+
+        if not all([pdf_files, time, whereto, from_where]):
+            missing_fields = "Missing required fields: "
+            if not pdf_files:
+                missing_fields += "pdf_files "
+            if not time:
+                missing_fields += "time "
+            if not whereto:
+                missing_fields += "whereto "
+            if not from_where:
+                missing_fields += "fromWhere "
+
+            return jsonify({"error": missing_fields}), 400
+
+        result = chat_service.get_best_times_from_timetable(
+            pdf_files, time, whereto, from_where
+        )
+        return jsonify({"result": result})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+@app.route("/ask-text", methods=["POST"])
+def ask_text():
+    try:
+        data = request.json
+        prompt = data.get("prompt")
+        history = data.get("history", [])
+
+        if not prompt:
+            return jsonify({"error": "Missing required field: prompt"}), 400
+
+        result = chat_service.ask_gpt_from_text(prompt, history)
+        return jsonify({"response": result})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+
+# temporary in-memory store
+crowd_report_service = CrowdReportService()
+
+@app.route("/crowd-report", methods=["POST"])
+def crowd_report():
+    try:
+        data = request.json
+        report = {
+            "routeId": data.get("routeId"),
+            "stop": data.get("stop"),
+            "status": data.get("status"),
+            "userId": data.get("userId", "anon"),
+            "location": data.get("location"),  # { lat, lng, accuracy }
+        }
+        crowd_report_service.add_report(report)  # 👉 replace with DB insert later
+        return jsonify({"success": True, "report": report}), 201
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/crowd-reports", methods=["GET"])
+def get_crowd_reports():
+    try:
+        route_id = request.args.get("routeId")
+        stop = request.args.get("stop")
+
+        # filter results
+        results = crowd_report_service.get_reports(route_id, stop)
+
+        return jsonify({"success": True, "reports": results}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@app.route("/crowd-reports/nearby", methods=["GET"])
+def get_nearby_crowd_reports():
+    try:
+        lat = request.args.get("lat", type=float)
+        lng = request.args.get("lng", type=float)
+        radius = request.args.get("radius", default=500, type=float)
+        minutes = request.args.get("minutes", default=30, type=float)
+
+        if lat is None or lng is None:
+            return jsonify({"success": False, "error": "Missing lat or lng"}), 400
+        if not all(map(math.isfinite, (lat, lng, radius, minutes))):
+            return jsonify({"success": False, "error": "lat, lng, radius and minutes must be finite numbers"}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({"success": False, "error": "lat must be between -90 and 90 and lng between -180 and 180"}), 400
+        if radius <= 0 or minutes <= 0:
+            return jsonify({"success": False, "error": "radius and minutes must be positive"}), 400
+
+        # find_nearby caps radius and minutes, so a huge value cannot overflow the cutoff
+        results = crowd_report_service.find_nearby(lat, lng, radius, minutes)
+        return jsonify({"success": True, "reports": results}), 200
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# Accepts repeated or comma-separated values, e.g. ?routeId=A,B&routeId=C
+def get_list_arg(name):
+    return split_filter_values(request.args.getlist(name))
+
+
+# Under plain WSGI each open stream holds a worker thread for the whole connection, so
+# only a few may be open at once; asgi_app serves this route on the event loop instead
+WSGI_STREAM_LIMIT = int(os.getenv('WSGI_STREAM_LIMIT', '2'))
+wsgi_streams = threading.BoundedSemaphore(WSGI_STREAM_LIMIT)
+
+
+@app.route("/crowd-reports/stream", methods=["GET"])
+def stream_crowd_reports():
+    if not wsgi_streams.acquire(blocking=False):
+        return jsonify({"error": "Too many open streams; serve asgi_app for live updates at scale."}), 503
+    subscription = crowd_report_service.subscribe(get_list_arg("routeId"), get_list_arg("stop"))
+    response = Response(
+        stream_with_context(crowd_report_service.stream(subscription)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs even when the client leaves before the stream starts
+    response.call_on_close(lambda: crowd_report_service.unsubscribe(subscription))
+    response.call_on_close(wsgi_streams.release)
+    return response
+    
+if __name__ == "__main__":
+    import os
+    port = int(os.environ.get("PORT", 5000))  # Render sets PORT env var
+    app.run(host="0.0.0.0", port=port)
+
+    
+
+
+
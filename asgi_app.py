@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from app import app as flask_app, chat_service, crowd_report_service, pdf_service
+from crowd_report_service import split_filter_values
+from metrics import REQUEST_SECONDS
+from request_profiler import RequestProfiler, profiling_requested
+from schedule_service import ScheduleService
+
+# Async serving mode: run with `uvicorn asgi_app:app`.
+# I/O-bound handlers (OpenAI, GABS scraping) await a pooled httpx client, CPU-bound
+# index queries run on a bounded executor, and every other endpoint is served by
+# the Flask app mounted underneath.
+INDEX_EXECUTOR_WORKERS = int(os.getenv('INDEX_EXECUTOR_WORKERS', '4'))
+WSGI_WORKERS = int(os.getenv('WSGI_WORKERS', '8'))
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', '60'))
+
+index_executor = ThreadPoolExecutor(max_workers=INDEX_EXECUTOR_WORKERS, thread_name_prefix='index')
+http_client = None
+
+
+async def run_on_index_executor(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(index_executor, fn, *args)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS),
+    )
+    try:
+        yield
+    finally:
+        await http_client.aclose()
+        index_executor.shutdown(wait=False)
+
+
+# Times the natively async routes; requests falling through to the mounted Flask
+# app are already recorded by its own request hooks
+class RequestMetricsMiddleware:
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope['method'], scope['path'], str(status))
+
+
+# Profiles the natively async routes on request, sampling the event loop thread and
+# the index executor; the profile is saved when the response starts
+class RequestProfilerMiddleware:
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if (scope['type'] != 'http' or scope['path'] not in self.paths
+                or not profiling_requested(Headers(scope=scope), QueryParams(scope['query_string']))):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = RequestProfiler(f"{scope['method']} {scope['path']}", thread_prefixes=('index',)).start()
+
+        async def send_with_profile(message):
+            if message['type'] == 'http.response.start' and not profiler.stopped.is_set():
+                name = profiler.stop().save()
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-profile-file', name.encode()),
+                    (b'x-profile-samples', str(profiler.samples).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profiler.stop()
+
+
+async def list_files(request):
+    return JSONResponse({'files': await pdf_service.fetch_pdf_links_async(http_client)})
+
+
+async def get_schedule(request):
+    user_location = request.query_params.get('user_location')
+    dest = request.query_params.get('destination')
+
+    if not user_location or not dest:
+        return JSONResponse({"error": "Missing user_location or destination"}, status_code=400)
+
+    times = await run_on_index_executor(
+        ScheduleService().find_times_for_location_and_destination, user_location, dest
+    )
+
+    if times:
+        return JSONResponse({"times": times}, status_code=200)
+    else:
+        return JSONResponse({"message": f"No schedule found for {user_location} to {dest}."}, status_code=404)
+
+
+async def best_times(request):
+    try:
+        data = await request.json()
+        pdf_files = data.get("pdf_files")  # list of file paths
+        time = data.get("time")
+        whereto = data.get("whereto")
+        from_where = data.get("fromWhere")
+
+        if not all([pdf_files, time, whereto, from_where]):
+            missing_fields = "Missing required fields: "
+            if not pdf_files:
+                missing_fields += "pdf_files "
+            if not time:
+                missing_fields += "time "
+            if not whereto:
+                missing_fields += "whereto "
+            if not from_where:
+                missing_fields += "fromWhere "
+
+            return JSONResponse({"error": missing_fields}, status_code=400)
+
+        result = await chat_service.get_best_times_from_timetable_async(
+            http_client, pdf_files, time, whereto, from_where
+        )
+        return JSONResponse({"result": result})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def ask_text(request):
+    try:
+        data = await request.json()
+        prompt = data.get("prompt")
+        history = data.get("history", [])
+
+        if not prompt:
+            return JSONResponse({"error": "Missing required field: prompt"}, status_code=400)
+
+        result = await chat_service.ask_gpt_from_text_async(http_client, prompt, history)
+        return JSONResponse({"response": result})
+
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+# Live crowd reports on the event loop: an idle subscriber is a pending await rather
+# than a WSGI thread, so watchers never starve the mounted Flask endpoints
+async def stream_crowd_reports(request):
+    subscription = crowd_report_service.subscribe(
+        split_filter_values(request.query_params.getlist('routeId')),
+        split_filter_values(request.query_params.getlist('stop')),
+        loop=asyncio.get_running_loop(),
+    )
+    return StreamingResponse(
+        crowd_report_service.stream_async(subscription),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        background=BackgroundTask(crowd_report_service.unsubscribe, subscription),
+    )
+
+
+async_routes = [
+    Route('/files', list_files, methods=['GET']),
+    Route('/schedules', get_schedule, methods=['GET']),
+    Route('/best-times', best_times, methods=['POST']),
+    Route('/ask-text', ask_text, methods=['POST']),
+    Route('/crowd-reports/stream', stream_crowd_reports, methods=['GET']),
+]
+
+app = Starlette(
+    routes=async_routes + [Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_WORKERS))],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(RequestMetricsMiddleware, paths={route.path for route in async_routes}),
+        Middleware(RequestProfilerMiddleware, paths={route.path for route in async_routes}),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.environ.get("PORT", 5000))
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,61 @@
+"""Retained heap of the parsed routes, per route and in total.
+
+Usage: python benchmarks/route_memory_bench.py [--files N]
+
+Parses the timetables in pdf_downloads into Route objects the same way
+ScheduleService.build_routes does (sequentially, to keep the measurement
+deterministic) and reports what tracemalloc still sees allocated once parse
+temporaries have been collected.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=None, help='only parse the first N timetables')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from schedule_service import ScheduleService
+        service = ScheduleService()
+        files = sorted(service.get_files_list()['files'])[:args.files]
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        routes = []
+        for file in files:
+            route = service.clean_route_data(file)
+            if route:
+                extracted = service.extract_route_data(route.pdf)
+                route.add_places(extracted['places'])
+                route.add_places_map(extracted['placesMap'])
+                routes.append(route)
+            del route
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+    stops = sum(len(route.places) for route in routes)
+    print(json.dumps({
+        'routes': len(routes),
+        'stops': stops,
+        'retained_bytes': retained,
+        'bytes_per_route': round(retained / len(routes)),
+        'bytes_per_stop': round(retained / stops),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Micro-benchmark: per-row day detection and place cleaning, before and after RowClassifier.
+
+Usage: python benchmarks/row_classifier_bench.py [--files N] [--repeat R]
+
+Rows are read from the timetables in pdf_downloads once up front, so only the
+classification itself is timed.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import fitz  # PyMuPDF
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from row_classifier import ROW_DAY, row_classifier  # noqa: E402
+
+PDF_DIR = 'pdf_downloads'
+
+
+# The parser's previous per-row day detection, kept here as the baseline
+def legacy_extract_day(text):
+    days = ["MONDAYS TO FRIDAYS", "Saturday", "Sunday"]
+    days_map = {"MONDAYS TO FRIDAYS": 'wd', "Saturday": 'wsa', "Sunday": 'wsu'}
+    text_lower = text.lower()
+    if text_lower == "a  - mondays,tuesdays,wednesdays,thursdays":
+        return None
+    for day in days:
+        re.search(rf'\b{day.lower()}\b', text_lower)
+    for day in days:
+        if day.lower() in text_lower:
+            return days_map[day]
+    return None
+
+
+LEGACY_INVALID_PATTERNS = [
+    r"^.*\b(STANDARD|SATURDAYS|SUNDAYS|OPERATED|REG|CONDITIONS|CARRIAGE|WEBSITE|LIABLE|ANY|LOSS|INCONVENIENCE|FAILURE|MAINTAIN|VEHICLES|TIMETABLE).*",
+    r"^[A-Za-z]+\.[A-Za-z]+$",
+    r"^[A-Za-z]+\s*[A-Za-z]+$",
+    r"\(",
+    r"^\s*$",
+]
+
+
+def legacy_clean_places(places):
+    return [place for place in places if not any(re.match(pattern, place) for pattern in LEGACY_INVALID_PATTERNS)]
+
+
+def classifier_extract_day(text):
+    kind, day = row_classifier.classify(text)
+    return day if kind == ROW_DAY else None
+
+
+def row_classifier_clean(places):
+    return [place for place in places if row_classifier.is_valid_place(place)]
+
+
+def load_rows(limit):
+    files = sorted(f for f in os.listdir(PDF_DIR) if f.endswith('.pdf'))[:limit]
+    rows = []
+    for filename in files:
+        with fitz.open(os.path.join(PDF_DIR, filename)) as doc:
+            for page in doc:
+                rows.extend(page.get_text("text").split('\n'))
+    return files, rows
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    files, rows = load_rows(args.files)
+    places = [cell.strip() for row in rows for cell in row.split('|') if cell.strip()]
+
+    # Both must agree on every row whose day flag the parser consumes
+    mismatched = sum(
+        1 for row in rows
+        if not row.lstrip().startswith('|') and legacy_extract_day(row) != classifier_extract_day(row)
+    )
+    assert legacy_clean_places(places) == row_classifier_clean(places)
+
+    results = [
+        ('day detection (legacy)', best_of(args.repeat, lambda: [legacy_extract_day(row) for row in rows]), len(rows)),
+        ('day detection (classifier)', best_of(args.repeat, lambda: [row_classifier.classify(row) for row in rows]), len(rows)),
+        ('clean_places (legacy)', best_of(args.repeat, legacy_clean_places, places), len(places)),
+        ('clean_places (classifier)', best_of(args.repeat, row_classifier_clean, places), len(places)),
+    ]
+
+    print(f"{len(files)} files, {len(rows)} rows, {len(places)} cells, {mismatched} header rows classified differently")
+    for label, seconds, count in results:
+        print(f"{label:<28} {seconds * 1000:9.2f} ms  {seconds / count * 1e9:8.0f} ns/item")
+
+
+if __name__ == "__main__":
+    main()
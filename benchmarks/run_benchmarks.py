@@ -0,0 +1,233 @@
+"""Offline benchmark suite over the timetables in pdf_downloads.
+
+Usage: python benchmarks/run_benchmarks.py [--queries N] [--seed S] [--output results.json]
+
+Times cold ingestion, a warm index rebuild, ScheduleService queries, /interpret
+and the HTTP endpoints through the Flask test client, and writes one JSON
+document with throughput and p50/p95/p99 latency per benchmark so runs can be
+diffed to catch regressions. ru_maxrss only ever grows, so each benchmark records
+the process's peak RSS so far (max_rss_so_far_mb), not its own; the top-level
+peak_rss_mb is the peak of the whole run. HTTP benchmarks fail on any unexpected
+status rather than timing error responses. Nothing here touches the network.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py refuses to import without a key; no endpoint benchmarked here calls OpenAI
+os.environ.setdefault('OPENAI_API_KEY', 'offline-benchmark')
+# Every query must hit the index under test rather than re-scanning the folder
+os.environ.setdefault('INDEX_RECHECK_SECONDS', '3600')
+
+INTERPRET_QUERIES = [
+    "from khayelitsha to cape town in the morning",
+    "bus frm mitchells plain to bellville",
+    "how do I get to wynberg from claremont after 6",
+    "kasi to mowbray train station",
+]
+
+
+# Peak RSS of the process so far, not of any one benchmark
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, total_seconds=None, items=None):
+    """Summary for one benchmark; latencies are per-call seconds."""
+    ordered = sorted(latencies)
+    total = total_seconds if total_seconds is not None else sum(ordered)
+    count = items if items is not None else len(ordered)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'count': count,
+        'total_seconds': round(total, 4),
+        'throughput_per_second': round(count / total, 2) if total else None,
+        'latency_ms': {
+            'mean': ms(total / len(ordered)) if ordered else None,
+            'p50': ms(percentile(ordered, 50)),
+            'p95': ms(percentile(ordered, 95)),
+            'p99': ms(percentile(ordered, 99)),
+            'max': ms(ordered[-1]) if ordered else None,
+        },
+        'max_rss_so_far_mb': peak_rss_mb(),
+    }
+
+
+def expect(response, statuses=(200, 304)):
+    if response.status_code not in statuses:
+        raise AssertionError(f"{response.request.method} {response.request.path} returned "
+                             f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+# A pair without departures is a 404 by design; any other status is a failure
+def expect_schedule(response):
+    if response.status_code == 404 and (response.get_json(silent=True) or {}).get('message', '').startswith('No schedule found'):
+        return response
+    return expect(response, (200,))
+
+
+def time_calls(calls):
+    latencies = []
+    for fn in calls:
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def sample_pairs(routes, count, rng):
+    """Origin/destination pairs taken from real routes, plus a share of unknown stops."""
+    routes = [route for route in routes if len(route.places) >= 2]
+    pairs = []
+    for i in range(count):
+        if i % 10 == 9:
+            pairs.append(('NOWHERE', rng.choice(routes).places[0]))
+            continue
+        origin, dest = rng.sample(rng.choice(routes).places, 2)
+        pairs.append((origin, dest))
+    return pairs
+
+
+def bench_ingestion(ScheduleService):
+    service = ScheduleService()
+    results = {}
+
+    ScheduleService._index = None
+    start = time.perf_counter()
+    index = service.get_index(recheck=True)
+    results['cold_ingestion'] = summarize([time.perf_counter() - start], items=len(index.routes))
+    results['cold_ingestion']['stops'] = sum(len(route.places) for route in index.routes)
+
+    # Same files again: OS page cache and the time-string memo are now warm
+    ScheduleService._index = None
+    start = time.perf_counter()
+    index = service.get_index(recheck=True)
+    results['warm_index_build'] = summarize([time.perf_counter() - start], items=len(index.routes))
+
+    # Per-file parse latency, sequential so each sample is one PDF
+    files = sorted(route.pdf for route in index.routes)
+    results['parse_per_file'] = summarize(time_calls(
+        [lambda pdf=pdf: service.extract_route_data(pdf) for pdf in files]
+    ))
+    return index, results
+
+
+def bench_queries(service, pairs, repeat):
+    results = {}
+    calls = [lambda o=origin, d=dest: service.find_times_for_location_and_destination(o, d) for origin, dest in pairs]
+    # First pass computes every pair, the second is answered from the result memo
+    results['find_times_for_location_and_destination'] = summarize(time_calls(calls))
+    results['find_times_for_location_and_destination (memoized)'] = summarize(time_calls(calls))
+    results['get_all_places'] = summarize(time_calls([service.get_all_places] * repeat))
+    return results
+
+
+def bench_http(client, index, pairs, repeat):
+    results = {}
+    sample_pdf = sorted(route.pdf for route in index.routes)[0]
+    batch = [
+        {'id': str(i), 'user_location': origin, 'destination': dest}
+        for i, (origin, dest) in enumerate(pairs[:100])
+    ]
+    requests = {
+        'GET /places': [lambda: expect(client.get('/places'))] * repeat,
+        'GET /all_routes': [lambda: expect(client.get('/all_routes'))] * repeat,
+        'GET /schedules': [
+            lambda o=origin, d=dest: expect_schedule(client.get('/schedules', query_string={'user_location': o, 'destination': d}))
+            for origin, dest in pairs
+        ],
+        'POST /schedules/batch': [lambda: expect(client.post('/schedules/batch', json={'queries': batch}))] * repeat,
+        'GET /table/<filename>': [lambda: expect(client.get(f'/table/{sample_pdf}'))] * repeat,
+        'GET /file/<filename>': [lambda: expect(client.get(f'/file/{sample_pdf}')).close()] * repeat,
+    }
+    for name, calls in requests.items():
+        results[name] = summarize(time_calls(calls))
+    return results
+
+
+def bench_interpret(repeat):
+    try:
+        from scrape import app as scrape_app  # pulls in spaCy through nlp_test
+    except Exception as e:  # the NLP model is an optional install
+        return {'POST /interpret': {'skipped': f"{type(e).__name__}: {e}"}}
+    client = scrape_app.test_client()
+    calls = [
+        lambda q=query: expect(client.post('/interpret', json={'query': q}))
+        for _ in range(repeat) for query in INTERPRET_QUERIES
+    ]
+    return {'POST /interpret': summarize(time_calls(calls))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', type=int, default=500, help='origin/destination pairs to query')
+    parser.add_argument('--repeat', type=int, default=50, help='calls per fixed-input benchmark')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # services resolve pdf_downloads relative to the working directory
+    rng = random.Random(args.seed)
+    benchmarks = {}
+
+    # The services print per-file and per-route progress; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        from schedule_service import ScheduleService
+        index, results = bench_ingestion(ScheduleService)
+        benchmarks.update(results)
+
+        service = ScheduleService()
+        pairs = sample_pairs(index.routes, args.queries, rng)
+        benchmarks.update(bench_queries(service, pairs, args.repeat))
+
+        from app import app
+        benchmarks.update(bench_http(app.test_client(), index, pairs, args.repeat))
+        benchmarks.update(bench_interpret(args.repeat))
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pdf_files': len(os.listdir('pdf_downloads')),
+            'routes': len(index.routes),
+            'index_version': index.version,
+            'queries': args.queries,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'benchmarks': benchmarks,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
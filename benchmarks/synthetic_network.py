@@ -0,0 +1,254 @@
+"""Synthetic timetable networks for scale testing the schedule engine.
+
+Usage:
+    python benchmarks/synthetic_network.py pdfs --scale 10 --output synthetic_10x
+    python benchmarks/synthetic_network.py curve --scales 1,10,100 [--ingest] [--output curve.json]
+
+Scale 1 matches the bundled corpus: ~880 routes over ~410 distinct stops, ~11
+stops per route and ~13 departures per stop. Routes and distinct stops both
+grow with the scale factor, and stop popularity is Zipf-like, so a few hub
+stops appear on many routes, as CAPE TOWN and MOWBRAY do in the corpus.
+
+A network can be produced in two shapes with identical content:
+  - parsed: schedule_service.Route objects exactly as PlaceMapService builds them,
+    for query benchmarks without any PDF work
+  - pdfs: timetables laid out like the GABS ones and named
+    FROM___TO_from_YYYYMMDD_to_99999999_NNNNNN.pdf, for ingestion benchmarks
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('INDEX_RECHECK_SECONDS', '3600')
+
+from run_benchmarks import peak_rss_mb, sample_pairs, summarize, time_calls  # noqa: E402
+
+BASE_ROUTES = 880
+BASE_STOPS = 410
+MAX_TRIPS_PER_TABLE = 22  # trip columns on a GABS timetable
+DAY_HEADERS = (('MONDAYS TO FRIDAYS', 'wd'), ('SATURDAYS', 'wsa'), ('SUNDAYS', 'wsu'))
+TRIPS_PER_DAY = {'wd': (4, 14), 'wsa': (0, 6), 'wsu': (0, 4)}
+
+SYLLABLES = ['KA', 'LA', 'MA', 'NGA', 'ZA', 'THE', 'BO', 'SI', 'KHA', 'LU', 'WE', 'NDO', 'PHA', 'RO', 'TU', 'YE']
+SUFFIXES = ['RD', 'STATION', 'TERM', 'CENTRE', 'SQUARE', 'AVE', 'MALL', 'CIRCLE', 'DEPOT', 'CLINIC']
+
+# Page geometry: landscape A4 with monospaced rows, as in the published PDFs
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595
+FONT_SIZE = 5.5
+LINE_HEIGHT = 8
+LINES_PER_PAGE = 68
+RULE = '-' * 178
+
+
+class SyntheticNetwork:
+    def __init__(self, scale=1.0, seed=1):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.stop_names = self.make_stop_names(max(2, round(BASE_STOPS * scale)))
+        # Zipf-like popularity: the i-th stop is drawn with weight 1 / (i + 1) ** 0.8
+        weights = [1 / (i + 1) ** 0.8 for i in range(len(self.stop_names))]
+        self.cum_weights = []
+        total = 0
+        for weight in weights:
+            total += weight
+            self.cum_weights.append(total)
+        self.timetables = [self.make_timetable(number) for number in range(1, max(1, round(BASE_ROUTES * scale)) + 1)]
+
+    # Distinct names that pass ScheduleService.clean_places: three tokens, no '-', ':' or '('
+    def make_stop_names(self, count):
+        names = set()
+        while len(names) < count:
+            word = ''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+            names.add(f"{word} {self.rng.choice(SUFFIXES)} {self.rng.randint(1, 99)}")
+        return sorted(names, key=lambda _: self.rng.random())
+
+    def make_timetable(self, number):
+        count = min(len(self.stop_names), self.rng.randint(2, 22))
+        stops = []
+        while len(stops) < count:
+            stop = self.rng.choices(self.stop_names, cum_weights=self.cum_weights)[0]
+            if stop not in stops:
+                stops.append(stop)
+        travel = [self.rng.randint(2, 12) for _ in stops[1:]]
+
+        days = []
+        for header, flag in DAY_HEADERS:
+            low, high = TRIPS_PER_DAY[flag]
+            trips = self.rng.randint(low, high)
+            first = self.rng.randint(4 * 60 + 30, 8 * 60)
+            headway = self.rng.choice([10, 15, 20, 30, 45, 60])
+            columns = []
+            for trip in range(trips):
+                footnote = self.rng.choice(['', '', '', 'a', 'b'])
+                minutes = first + trip * headway
+                column = [minutes]
+                for hop in travel:
+                    column.append(column[-1] + hop)
+                columns.append([f"{m // 60 % 24:02d}:{m % 60:02d}{footnote}" for m in column])
+            days.append((header, flag, columns))
+
+        effective_date = f"2025{self.rng.randint(1, 12):02d}{self.rng.randint(1, 28):02d}"
+        filename = f"{stops[0]}___{stops[-1]}_from_{effective_date}_to_99999999_{number:06d}.pdf".replace(' ', '_')
+        return {'filename': filename, 'stops': stops, 'days': days}
+
+    # (stop name, [cell, ...], day flag) tables, the shape PlaceMapService.add_table takes
+    def tables(self, timetable):
+        for header, flag, columns in timetable['days']:
+            for start in range(0, len(columns), MAX_TRIPS_PER_TABLE):
+                chunk = columns[start:start + MAX_TRIPS_PER_TABLE]
+                if chunk:
+                    yield header, [
+                        (stop, [column[position] for column in chunk], flag)
+                        for position, stop in enumerate(timetable['stops'])
+                    ]
+
+    def routes(self):
+        """Route objects in the parsed shape the index is built from."""
+        from pdf_service import PlaceMapService
+        from schedule_service import ScheduleService
+        service = ScheduleService()
+        routes = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for timetable in self.timetables:
+                route = service.clean_route_data(timetable['filename'])
+                place_service = PlaceMapService()
+                places_found = []
+                for _, table in self.tables(timetable):
+                    place_service.add_table(table, places_found)
+                route.add_places(places_found)
+                route.add_places_map(place_service.places_map)
+                routes.append(route)
+        return routes
+
+    def page_blocks(self, timetable):
+        for header, table in self.tables(timetable):
+            lines = [header, RULE]
+            for stop, cells, _ in table:
+                padded = cells + ['  --  '] * (MAX_TRIPS_PER_TABLE - len(cells))
+                lines.append(f"| {stop:<20}|" + '|'.join(f"{cell:<6}" for cell in padded) + '|')
+            lines.append(RULE)
+            yield lines
+        for header, _, columns in timetable['days']:
+            if not columns:
+                yield [f"{header} - NO SERVICE"]
+        yield ['ABBREVIATIONS', 'a  - Mondays,Tuesdays,Wednesdays,Thursdays', 'b  - Fridays']
+
+    def write_pdf(self, timetable, folder):
+        import fitz  # PyMuPDF
+        title = ' - '.join(timetable['stops'][::max(1, len(timetable['stops']) // 3)])
+        pages = [[title]]
+        for block in self.page_blocks(timetable):
+            # A block never straddles pages: the parser resets the day flag per page
+            if len(pages[-1]) + len(block) > LINES_PER_PAGE:
+                pages.append([title])
+            pages[-1].extend(block)
+
+        doc = fitz.open()
+        for lines in pages:
+            page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            page.insert_text((20, 30), '\n'.join(lines), fontname='cour', fontsize=FONT_SIZE, lineheight=LINE_HEIGHT / FONT_SIZE)
+        doc.save(os.path.join(folder, timetable['filename']), garbage=3, deflate=True)
+        doc.close()
+
+    def write_pdfs(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        for timetable in self.timetables:
+            self.write_pdf(timetable, folder)
+        return len(self.timetables)
+
+
+def install_index(routes, version):
+    """Makes every ScheduleService query run against the given routes."""
+    from schedule_service import ScheduleService, TimetableIndex
+    ScheduleService._index = TimetableIndex(routes, version)
+    ScheduleService._index_checked_at = time.monotonic()
+
+
+def measure_scale(scale, args):
+    from schedule_service import ScheduleService, TimetableIndex
+    result = {'scale': scale}
+
+    start = time.perf_counter()
+    network = SyntheticNetwork(scale, args.seed)
+    routes = network.routes()
+    result['generate_seconds'] = round(time.perf_counter() - start, 3)
+    result['routes'] = len(routes)
+    result['distinct_stops'] = len(network.stop_names)
+    result['stop_occurrences'] = sum(len(route.places) for route in routes)
+
+    start = time.perf_counter()
+    install_index(routes, f"synthetic-{scale}")
+    result['index_build'] = summarize([time.perf_counter() - start], items=len(routes))
+
+    if args.ingest:
+        with tempfile.TemporaryDirectory() as workdir:
+            network.write_pdfs(os.path.join(workdir, 'pdf_downloads'))
+            cwd = os.getcwd()
+            os.chdir(workdir)  # the parser reads from ./pdf_downloads
+            try:
+                ScheduleService._index = None
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ingested = ScheduleService().get_index(recheck=True)
+                result['pdf_ingestion'] = summarize([time.perf_counter() - start], items=len(ingested.routes))
+            finally:
+                os.chdir(cwd)
+            install_index(routes, f"synthetic-{scale}")
+
+    service = ScheduleService()
+    pairs = sample_pairs(routes, args.queries, random.Random(args.seed))
+    with contextlib.redirect_stdout(io.StringIO()):
+        result['find_times_for_location_and_destination'] = summarize(time_calls(
+            [lambda o=origin, d=dest: service.find_times_for_location_and_destination(o, d) for origin, dest in pairs]
+        ))
+        result['get_all_places'] = summarize(time_calls([service.get_all_places] * args.repeat))
+    # Scales run in one process, so this is the peak so far, not this scale's own
+    result['max_rss_so_far_mb'] = peak_rss_mb()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pdfs = commands.add_parser('pdfs', help='write a synthetic network as timetable PDFs')
+    pdfs.add_argument('--scale', type=float, default=1.0)
+    pdfs.add_argument('--seed', type=int, default=1)
+    pdfs.add_argument('--output', required=True, help='folder to write the PDFs into')
+
+    curve = commands.add_parser('curve', help='ingestion and query timings across scale factors')
+    curve.add_argument('--scales', default='1,10,100', help='comma-separated scale factors')
+    curve.add_argument('--queries', type=int, default=500)
+    curve.add_argument('--repeat', type=int, default=10)
+    curve.add_argument('--seed', type=int, default=1)
+    curve.add_argument('--ingest', action='store_true', help='also write and parse PDFs at each scale')
+    curve.add_argument('--output', help='write JSON here instead of stdout')
+
+    args = parser.parse_args()
+    if args.command == 'pdfs':
+        count = SyntheticNetwork(args.scale, args.seed).write_pdfs(args.output)
+        print(f"Wrote {count} timetables to {args.output}")
+        return
+
+    # Keep service progress prints and library warnings out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = {'scales': [measure_scale(float(scale), args) for scale in args.scales.split(',')]}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
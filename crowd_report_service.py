@@ -0,0 +1,257 @@
+import asyncio
+import json
+import math
+import queue
+import threading
+from datetime import datetime, timedelta
+
+# Size of a grid bucket in degrees of latitude (~550 m)
+GRID_CELL_DEG = 0.005
+EARTH_RADIUS_M = 6371000
+METRES_PER_DEG_LAT = 111320
+MAX_NEARBY_RADIUS_M = 5000
+# Oldest reports a nearby query looks back over
+MAX_NEARBY_MINUTES = 24 * 60
+# Events buffered per subscriber before a slow client is dropped
+MAX_PENDING_EVENTS = 100
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in metres."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+# routeId/stop filters may be repeated or comma-separated: ?routeId=a,b&routeId=c
+def split_filter_values(values):
+    split = []
+    for value in values:
+        split.extend(v.strip() for v in value.split(",") if v.strip())
+    return split
+
+
+class ReportSubscription:
+    # With a loop, the subscriber is an async stream on it: pushes from publisher threads
+    # wake it through the loop instead of a thread blocked on the queue
+    def __init__(self, route_ids=None, stops=None, max_pending=MAX_PENDING_EVENTS, loop=None):
+        self.route_ids = set(route_ids or [])
+        self.stops = {stop.lower() for stop in stops or []}
+        self.events = queue.Queue(maxsize=max_pending)
+        self.closed = False
+        self.loop = loop
+        self.wakeup = asyncio.Event() if loop is not None else None
+
+    def matches(self, report):
+        if self.route_ids and report.get('routeId') not in self.route_ids:
+            return False
+        if self.stops and (report.get('stop') or '').lower() not in self.stops:
+            return False
+        return True
+
+    # Never blocks the publisher: a subscriber that falls behind is closed
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.closed = True
+            return
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.wakeup.set)
+            except RuntimeError:  # the loop is gone along with its stream
+                self.closed = True
+
+    def next_event(self, timeout):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def next_event_async(self, timeout):
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            pass
+        self.wakeup.clear()
+        try:
+            # Checked again after clearing, so a push in between is not missed
+            return self.events.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class CrowdReportService:
+    def __init__(self, cell_deg=GRID_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.reports = []
+        # (lat cell, lng cell) -> [(received_at, lat, lng, report)] in arrival order
+        self.grid = {}
+        # (routeId, stop) -> {status: count}
+        self.aggregates = {}
+        # Subscriptions are indexed by their most selective filter so a new
+        # report only visits the subscribers that could want it
+        self.subscribers_by_route = {}
+        self.subscribers_by_stop = {}
+        self.wildcard_subscribers = set()
+        self.lock = threading.Lock()
+
+    def cell_for(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    # Reports without a usable {lat, lng} are stored but not spatially indexed
+    def parse_location(self, location):
+        if not isinstance(location, dict):
+            return None
+        try:
+            lat = float(location.get('lat'))
+            lng = float(location.get('lng'))
+        except (TypeError, ValueError):
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return None
+        return lat, lng
+
+    def add_report(self, report):
+        received_at = datetime.utcnow()
+        report['timestamp'] = received_at.isoformat()
+        coords = self.parse_location(report.get('location'))
+        with self.lock:
+            self.reports.append(report)
+            if coords:
+                lat, lng = coords
+                self.grid.setdefault(self.cell_for(lat, lng), []).append((received_at, lat, lng, report))
+            aggregate = self.update_aggregate(report)
+            subscribers = self.subscribers_for(report)
+        self.publish(report, aggregate, subscribers)
+        return report
+
+    def update_aggregate(self, report):
+        key = (report.get('routeId'), (report.get('stop') or '').lower())
+        counts = self.aggregates.setdefault(key, {})
+        status = report.get('status')
+        counts[status] = counts.get(status, 0) + 1
+        return {
+            'routeId': report.get('routeId'),
+            'stop': report.get('stop'),
+            'counts': dict(counts),
+            'total': sum(counts.values()),
+        }
+
+    def subscribers_for(self, report):
+        candidates = set(self.wildcard_subscribers)
+        candidates.update(self.subscribers_by_route.get(report.get('routeId'), ()))
+        candidates.update(self.subscribers_by_stop.get((report.get('stop') or '').lower(), ()))
+        return [subscription for subscription in candidates if subscription.matches(report)]
+
+    # Each event is serialized once and the same payload is shared by every subscriber
+    def publish(self, report, aggregate, subscribers):
+        if not subscribers:
+            return
+        report_event = f"event: report\ndata: {json.dumps(report)}\n\n"
+        aggregate_event = f"event: aggregate\ndata: {json.dumps(aggregate)}\n\n"
+        for subscription in subscribers:
+            subscription.push(report_event)
+            subscription.push(aggregate_event)
+            if subscription.closed:
+                self.unsubscribe(subscription)
+
+    def subscribe(self, route_ids=None, stops=None, loop=None):
+        subscription = ReportSubscription(route_ids, stops, loop=loop)
+        with self.lock:
+            if subscription.route_ids:
+                for route_id in subscription.route_ids:
+                    self.subscribers_by_route.setdefault(route_id, set()).add(subscription)
+            elif subscription.stops:
+                for stop in subscription.stops:
+                    self.subscribers_by_stop.setdefault(stop, set()).add(subscription)
+            else:
+                self.wildcard_subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self.lock:
+            self.wildcard_subscribers.discard(subscription)
+            for route_id in subscription.route_ids:
+                self.discard_subscriber(self.subscribers_by_route, route_id, subscription)
+            for stop in subscription.stops:
+                self.discard_subscriber(self.subscribers_by_stop, stop, subscription)
+
+    # Drops the filter's entry once its last subscriber leaves
+    def discard_subscriber(self, subscribers_by_key, key, subscription):
+        subscribers = subscribers_by_key.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del subscribers_by_key[key]
+
+    # Server-Sent Events stream for one subscriber, with periodic keep-alives. Holds a
+    # thread for the whole connection; asgi_app serves stream_async instead
+    def stream(self, subscription, heartbeat_seconds=15):
+        try:
+            yield ": subscribed\n\n"
+            while not subscription.closed:
+                event = subscription.next_event(heartbeat_seconds)
+                yield event if event else ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    # The same stream on the event loop: an idle subscriber costs a pending await, not a thread
+    async def stream_async(self, subscription, heartbeat_seconds=15):
+        try:
+            yield ": subscribed\n\n"
+            while not subscription.closed:
+                event = await subscription.next_event_async(heartbeat_seconds)
+                yield event if event else ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_reports(self, route_id=None, stop=None):
+        results = self.reports
+        if route_id:
+            results = [r for r in results if r["routeId"] == route_id]
+        if stop:
+            results = [r for r in results if r["stop"] and r["stop"].lower() == stop.lower()]
+        return results
+
+    # Only the buckets overlapping the search circle are visited, and each bucket
+    # is walked newest-first until the time window is exhausted
+    def find_nearby(self, lat, lng, radius_m, minutes):
+        radius_m = min(radius_m, MAX_NEARBY_RADIUS_M)
+        minutes = min(minutes, MAX_NEARBY_MINUTES)
+        cutoff = datetime.utcnow() - timedelta(minutes=minutes)
+
+        lat_span = radius_m / METRES_PER_DEG_LAT
+        lng_span = radius_m / (METRES_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        min_lat_cell, min_lng_cell = self.cell_for(lat - lat_span, lng - lng_span)
+        max_lat_cell, max_lng_cell = self.cell_for(lat + lat_span, lng + lng_span)
+
+        nearby = []
+        with self.lock:
+            for lat_cell in range(min_lat_cell, max_lat_cell + 1):
+                for lng_cell in range(min_lng_cell, max_lng_cell + 1):
+                    bucket = self.grid.get((lat_cell, lng_cell))
+                    if not bucket:
+                        continue
+                    for received_at, report_lat, report_lng, report in reversed(bucket):
+                        if received_at < cutoff:
+                            break
+                        distance = haversine_m(lat, lng, report_lat, report_lng)
+                        if distance <= radius_m:
+                            nearby.append((distance, report))
+
+        nearby.sort(key=lambda item: item[0])
+        return [{**report, 'distance_m': round(distance)} for distance, report in nearby]
@@ -0,0 +1,418 @@
+"""GTFS-static export of the parsed network, and the matching importer.
+
+Usage: python gtfs_service.py export [folder]
+       python gtfs_service.py import [folder-or-zip]
+
+The PDFs parse into per-stop departure lists, not timetable columns, so trips are
+reconstructed: within one direction block of a route (a run of stops that starts
+where the parser saw a new table, i.e. prev == '') and one day type, a trip starts at
+the earliest unused departure and takes, at each following stop, the first unused
+departure at or after the previous one. A stop without one is skipped. Only trips of
+two or more stops with non-decreasing times are written to stop_times.txt; the
+departures left over travel in ridelogic_extra_departures.txt. Everything else the
+index needs that GTFS cannot express (footnotes, the raw stop spellings and their
+order, untimed stops) travels in extension columns and ridelogic_route_stops.txt,
+which GTFS consumers ignore, so export followed by import rebuilds the same routes.
+
+Stops take their coordinates from data/stop_coordinates.csv. GTFS requires them for
+every stop and station, so until that file covers the network the feed round-trips
+through load_gtfs but is not fit for routing tools; export_gtfs logs how many stops
+are missing them.
+"""
+import argparse
+import csv
+from bisect import bisect_left
+import hashlib
+import io
+import logging
+import os
+import re
+import zipfile
+from metrics import timed
+from stop_catalog import StopCatalog
+from stop_location_service import StopLocationService
+from timetable_time import DAY_MASK_BITS, DayType, TimetableTime, footnote_bit, footnote_letters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GTFS_PATH = os.path.join('data', 'gtfs')
+AGENCY = {
+    'agency_id': 'GABS',
+    'agency_name': 'Golden Arrow Bus Services',
+    'agency_url': 'https://www.gabs.co.za',
+    'agency_timezone': 'Africa/Johannesburg',
+}
+ROUTE_TYPE_BUS = 3
+# Timetables valid "to 99999999" are open-ended; GTFS needs a real date
+OPEN_END_DATE = '20991231'
+ROUTE_STOPS_FILE = 'ridelogic_route_stops.txt'
+EXTRA_DEPARTURES_FILE = 'ridelogic_extra_departures.txt'
+# Longest gap between two consecutive timed stops of one reconstructed trip
+MAX_STOP_GAP_MINUTES = 90
+DAY_MASK = int(DayType.ANY)
+
+COLUMNS = {
+    'agency.txt': list(AGENCY),
+    'stops.txt': ['stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'location_type', 'parent_station'],
+    'routes.txt': ['route_id', 'agency_id', 'route_short_name', 'route_long_name', 'route_type'],
+    'trips.txt': ['route_id', 'service_id', 'trip_id', 'trip_headsign', 'direction_id'],
+    'stop_times.txt': ['trip_id', 'arrival_time', 'departure_time', 'stop_id', 'stop_sequence', 'ridelogic_footnotes'],
+    'calendar.txt': ['service_id', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', 'start_date', 'end_date'],
+    ROUTE_STOPS_FILE: ['route_id', 'stop_id', 'sequence', 'prev_stop_name', 'next_stop_name'],
+    EXTRA_DEPARTURES_FILE: ['route_id', 'service_id', 'stop_id', 'departure_time', 'ridelogic_footnotes'],
+}
+# calendar.txt weekday columns in order, with the DayType each belongs to
+WEEKDAY_DAY_TYPES = (DayType.WEEKDAY,) * 5 + (DayType.SATURDAY, DayType.SUNDAY)
+END_DATE_PATTERN = re.compile(r'_to_(\d{8})_')
+
+
+def gtfs_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def parse_gtfs_time(text):
+    hours, minutes, _ = text.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_footnotes(letters):
+    footnotes = 0
+    for letter in letters:
+        footnotes |= footnote_bit(letter)
+    return footnotes
+
+
+def route_id_for(route):
+    return os.path.splitext(route.pdf)[0]
+
+
+def service_id_for(route, day_mask):
+    match = END_DATE_PATTERN.search(route.pdf)
+    end_date = match.group(1) if match and match.group(1) != '99999999' else OPEN_END_DATE
+    return f"{route.effective_date}-{end_date}-{day_mask}"
+
+
+# A route's stops split into the blocks the parser read as separate tables
+def direction_blocks(route):
+    blocks = []
+    for name, record in route.stops.items():
+        if not blocks or not record.prev:
+            blocks.append([])
+        blocks[-1].append((name, record))
+    return blocks
+
+
+def build_trips(block):
+    """Chains a direction block's departures into trips.
+
+    Returns (trips, extras): trips as (day mask, [(sequence, name, minutes, footnotes)])
+    and the departures no trip took as (day mask, name, minutes, footnotes).
+    """
+    departures = {}  # day mask -> per stop of the block, sorted [(minutes, footnotes)]
+    for sequence, (name, record) in enumerate(block):
+        for minutes, flags in zip(record.minutes, record.flags):
+            stops = departures.setdefault(flags & DAY_MASK, [[] for _ in block])
+            stops[sequence].append((minutes, flags >> DAY_MASK_BITS))
+
+    trips, extras = [], []
+    for day_mask, stops in sorted(departures.items()):
+        for stop in stops:
+            stop.sort()
+        for start, stop in enumerate(stops):
+            while stop:
+                minutes, footnotes = stop.pop(0)
+                trip = [(start, block[start][0], minutes, footnotes)]
+                for sequence in range(start + 1, len(block)):
+                    candidates = stops[sequence]
+                    position = bisect_left(candidates, (minutes,))
+                    if position == len(candidates) or candidates[position][0] - minutes > MAX_STOP_GAP_MINUTES:
+                        continue
+                    minutes, footnotes = candidates.pop(position)
+                    trip.append((sequence, block[sequence][0], minutes, footnotes))
+                if len(trip) > 1:
+                    trips.append((day_mask, trip))
+                else:
+                    extras.append((day_mask, trip[0][1], trip[0][2], trip[0][3]))
+    trips.sort(key=lambda trip: (trip[0], trip[1][0][2], trip[1][0][0]))
+    return trips, extras
+
+
+def check_trip(trip_id, stop_times):
+    """Raises ValueError unless the trip is one GTFS consumers accept."""
+    if len(stop_times) < 2:
+        raise ValueError(f"trip {trip_id} has {len(stop_times)} stop, GTFS trips need at least 2")
+    for earlier, later in zip(stop_times, stop_times[1:]):
+        if later[0] <= earlier[0] or later[2] < earlier[2]:
+            raise ValueError(f"trip {trip_id} goes back from stop {earlier[0]} at {gtfs_time(earlier[2])} "
+                             f"to stop {later[0]} at {gtfs_time(later[2])}")
+
+
+class GTFSExporter:
+    """Writes GTFS files one route at a time; only the calendar rows seen so far are
+    held in memory, so memory stays flat however many routes are exported."""
+
+    def __init__(self, folder, catalog, coordinates=None):
+        self.folder = folder
+        self.catalog = catalog
+        self.coordinates = coordinates or {}
+        self.services = {}  # service_id -> calendar row
+        self.stop_ids = {}  # raw spelling -> GTFS stop_id
+        self.counts = dict.fromkeys(COLUMNS, 0)
+        self.missing_coordinates = 0
+
+    def __enter__(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.files = {}
+        self.writers = {}
+        for name, columns in COLUMNS.items():
+            self.files[name] = open(os.path.join(self.folder, name), 'w', newline='', encoding='utf-8')
+            self.writers[name] = csv.writer(self.files[name])
+            self.writers[name].writerow(columns)
+        self.write('agency.txt', list(AGENCY.values()))
+        self.write_stops()
+        return self
+
+    def __exit__(self, *exc_info):
+        for row in self.services.values():
+            self.write('calendar.txt', row)
+        for file in self.files.values():
+            file.close()
+
+    def write(self, name, row):
+        self.writers[name].writerow(row)
+        self.counts[name] += 1
+
+    # Canonical stops become stations; each spelling the timetables use is a stop inside one
+    def write_stops(self):
+        for entry in self.catalog.stops.values():
+            lat, lng = self.coordinates.get(entry.name.upper(), ('', ''))
+            self.write_stop([entry.stop_id, entry.name, lat, lng, 1, ''])
+            for position, spelling in enumerate(entry.variants):
+                stop_id = f"{entry.stop_id}-{position}"
+                self.stop_ids[spelling] = stop_id
+                stop_lat, stop_lng = self.coordinates.get(spelling.upper(), (lat, lng))
+                self.write_stop([stop_id, spelling, stop_lat, stop_lng, 0, entry.stop_id])
+
+    def write_stop(self, row):
+        if row[2] == '':
+            self.missing_coordinates += 1
+        self.write('stops.txt', row)
+
+    def stop_id(self, name):
+        # Names the catalog skipped (nothing left after normalization) still need an id
+        if name not in self.stop_ids:
+            stop_id = 'x' + hashlib.sha1(name.encode()).hexdigest()[:10]
+            self.stop_ids[name] = stop_id
+            self.write_stop([stop_id, name, '', '', 0, ''])
+        return self.stop_ids[name]
+
+    def write_route(self, route):
+        route_id = route_id_for(route)
+        self.write('routes.txt', [route_id, AGENCY['agency_id'], route.time_table_no, route.getRouteName(), ROUTE_TYPE_BUS])
+        for sequence, name in enumerate(route.places):
+            record = route.stops.get(name)
+            self.write(ROUTE_STOPS_FILE, [
+                route_id, self.stop_id(name), sequence,
+                record.prev if record else '', (record.next or '') if record else '',
+            ])
+
+        blocks = direction_blocks(route)
+        for direction, block in enumerate(blocks):
+            headsign = block[-1][0]
+            trips, extras = build_trips(block)
+            ordinals = {}
+            for day_mask, stop_times in trips:
+                ordinal = ordinals[day_mask] = ordinals.get(day_mask, -1) + 1
+                trip_id = f"{route_id}-{direction}-{day_mask}-{ordinal}"
+                check_trip(trip_id, stop_times)
+                self.write('trips.txt', [route_id, self.service_id(route, day_mask), trip_id, headsign, direction if len(blocks) == 2 else ''])
+                for sequence, name, minutes, footnotes in stop_times:
+                    clock = gtfs_time(minutes)
+                    self.write('stop_times.txt', [trip_id, clock, clock, self.stop_id(name), sequence, footnote_letters(footnotes)])
+            for day_mask, name, minutes, footnotes in extras:
+                self.write(EXTRA_DEPARTURES_FILE, [
+                    route_id, self.service_id(route, day_mask), self.stop_id(name), gtfs_time(minutes), footnote_letters(footnotes),
+                ])
+
+    def service_id(self, route, day_mask):
+        service_id = service_id_for(route, day_mask)
+        if service_id not in self.services:
+            days = [1 if day_mask & day_type else 0 for day_type in WEEKDAY_DAY_TYPES]
+            start, end = service_id.split('-')[:2]
+            self.services[service_id] = [service_id, *days, start, end]
+        return service_id
+
+
+@timed('gtfs.export')
+def export_gtfs(routes, folder=DEFAULT_GTFS_PATH, catalog=None):
+    """Writes the routes as a GTFS feed folder and returns the row count of each file."""
+    catalog = catalog or StopCatalog.from_routes(routes)
+    locations = StopLocationService()
+    with GTFSExporter(folder, catalog, locations.load_csv()) as exporter:
+        for route in routes:
+            exporter.write_route(route)
+    logger.info("exported %d routes to %s", len(routes), folder)
+    if exporter.missing_coordinates:
+        logger.warning("%d of %d stops have no coordinates; the feed is not fit for routing tools until %s covers them",
+                       exporter.missing_coordinates, exporter.counts['stops.txt'], locations.csv_path)
+    return exporter.counts
+
+
+class FeedReader:
+    """Reads a GTFS feed from a folder or a .zip, one table at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path) if zipfile.is_zipfile(path) else None
+
+    def has(self, name):
+        if self.archive:
+            return name in self.archive.namelist()
+        return os.path.isfile(os.path.join(self.path, name))
+
+    # Rows as tuples plus a column -> position map; tuples keep large tables cheap to stream
+    def rows(self, name):
+        if self.archive:
+            file = io.TextIOWrapper(self.archive.open(name), encoding='utf-8-sig', newline='')
+        else:
+            file = open(os.path.join(self.path, name), encoding='utf-8-sig', newline='')
+        with file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            yield {column: position for position, column in enumerate(header)}
+            yield from reader
+
+
+def feed_version(path=DEFAULT_GTFS_PATH):
+    """Signature of a feed on disk, in the same spirit as ScheduleService.get_index_version."""
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    else:
+        files = [path]
+    entries = [f"{os.path.basename(file)}:{os.stat(file).st_size}:{os.stat(file).st_mtime_ns}" for file in files if os.path.isfile(file)]
+    return hashlib.sha1(('gtfs\n' + '\n'.join(entries)).encode()).hexdigest()[:16]
+
+
+def read_table(feed, name):
+    rows = feed.rows(name)
+    return next(rows), rows
+
+
+# Tables load_gtfs cannot do without
+REQUIRED_TABLES = ('stops.txt', 'calendar.txt', 'routes.txt', 'trips.txt', 'stop_times.txt')
+
+
+def missing_tables(path=DEFAULT_GTFS_PATH):
+    """Required tables the feed at path lacks; all of them when there is no feed."""
+    if not os.path.exists(path):
+        return list(REQUIRED_TABLES)
+    feed = FeedReader(path)
+    return [name for name in REQUIRED_TABLES if not feed.has(name)]
+
+
+@timed('gtfs.import')
+def load_gtfs(path=DEFAULT_GTFS_PATH):
+    """Rebuilds Route objects from a feed written by export_gtfs.
+
+    Feeds from elsewhere load too: routes are keyed by route_id, stops are ordered by
+    their first stop_sequence, and departures carry no footnotes.
+    """
+    from schedule_service import Route, ScheduleService
+
+    feed = FeedReader(path)
+    columns, rows = read_table(feed, 'stops.txt')
+    stop_names = {row[columns['stop_id']]: row[columns['stop_name']] for row in rows}
+
+    columns, rows = read_table(feed, 'calendar.txt')
+    day_columns = [columns[day] for day in COLUMNS['calendar.txt'][1:8]]
+    service_masks = {}
+    for row in rows:
+        mask = 0
+        for position, day_type in zip(day_columns, WEEKDAY_DAY_TYPES):
+            if row[position] == '1':
+                mask |= int(day_type)
+        service_masks[row[columns['service_id']]] = mask
+
+    columns, rows = read_table(feed, 'routes.txt')
+    routes = {}
+    schedule_service = ScheduleService()
+    for row in rows:
+        route_id = row[columns['route_id']]
+        # Our route ids are the PDF names, which carry the route's metadata
+        route = schedule_service.clean_route_data(f"{route_id}.pdf")
+        if route is None:
+            # Not one of ours: keep what GTFS says about it
+            long_name = row[columns['route_long_name']] if 'route_long_name' in columns else route_id
+            from_route, _, to_route = long_name.partition(' <-> ')
+            short_name = row[columns['route_short_name']] if 'route_short_name' in columns else ''
+            route = Route(from_route, to_route or from_route, f"{route_id}.pdf", '', short_name)
+        routes[route_id] = route
+
+    columns, rows = read_table(feed, 'trips.txt')
+    trips = {row[columns['trip_id']]: (row[columns['route_id']], service_masks.get(row[columns['service_id']], DAY_MASK)) for row in rows}
+
+    columns, rows = read_table(feed, 'stop_times.txt')
+    trip_col, stop_col, time_col = columns['trip_id'], columns['stop_id'], columns['departure_time']
+    sequence_col = columns['stop_sequence']
+    footnote_col = columns.get('ridelogic_footnotes')
+    times = {}  # (route_id, stop name) -> {TimetableTime}
+    first_sequence = {}  # (route_id, stop name) -> lowest stop_sequence seen
+    for row in rows:
+        route_id, day_mask = trips[row[trip_col]]
+        key = (route_id, stop_names[row[stop_col]])
+        footnotes = parse_footnotes(row[footnote_col]) if footnote_col is not None else 0
+        times.setdefault(key, set()).add(TimetableTime(parse_gtfs_time(row[time_col] or row[columns['arrival_time']]), day_mask, footnotes))
+        sequence = int(row[sequence_col])
+        if sequence < first_sequence.get(key, sequence + 1):
+            first_sequence[key] = sequence
+
+    if feed.has(EXTRA_DEPARTURES_FILE):
+        columns, rows = read_table(feed, EXTRA_DEPARTURES_FILE)
+        for row in rows:
+            day_mask = service_masks.get(row[columns['service_id']], DAY_MASK)
+            key = (row[columns['route_id']], stop_names[row[columns['stop_id']]])
+            footnotes = parse_footnotes(row[columns['ridelogic_footnotes']])
+            times.setdefault(key, set()).add(TimetableTime(parse_gtfs_time(row[columns['departure_time']]), day_mask, footnotes))
+
+    places = {}  # route_id -> [(name, prev, next)]
+    if feed.has(ROUTE_STOPS_FILE):
+        columns, rows = read_table(feed, ROUTE_STOPS_FILE)
+        for row in sorted(rows, key=lambda row: (row[columns['route_id']], int(row[columns['sequence']]))):
+            places.setdefault(row[columns['route_id']], []).append(
+                (stop_names[row[columns['stop_id']]], row[columns['prev_stop_name']], row[columns['next_stop_name']] or None)
+            )
+    else:
+        for (route_id, name), sequence in sorted(first_sequence.items(), key=lambda item: (item[0][0], item[1])):
+            stops = places.setdefault(route_id, [])
+            stops.append((name, stops[-1][0] if stops else '', None))
+
+    for route_id, route in routes.items():
+        stops = places.get(route_id, [])
+        route.add_places([name for name, _, _ in stops])
+        route.add_places_map([
+            {'name': name, 'encoded_times': sorted(times.get((route_id, name), ())), 'prev': prev, 'next': next}
+            for name, prev, next in stops
+        ])
+    logger.info("loaded %d routes from %s", len(routes), path)
+    return list(routes.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('path', nargs='?', default=DEFAULT_GTFS_PATH)
+    args = parser.parse_args()
+
+    from metrics import configure_logging
+    configure_logging()
+    if args.command == 'export':
+        from schedule_service import ScheduleService
+        index = ScheduleService().get_index()
+        print(export_gtfs(index.routes, args.path, index.catalog))
+    else:
+        routes = load_gtfs(args.path)
+        print({'routes': len(routes), 'stops': sum(len(route.places) for route in routes)})
+
+
+if __name__ == "__main__":
+    main()
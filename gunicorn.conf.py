@@ -0,0 +1,40 @@
+# Serving: `gunicorn app:app`, or for the async app
+# `gunicorn -k uvicorn.workers.UvicornWorker asgi_app:app`.
+# With preload the master imports the app and builds the read-only state before forking,
+# so the worker starts with a warm index; with several workers they would share those
+# pages copy-on-write instead of each parsing every PDF.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# Crowd reports, their grid index and SSE subscribers live per process, so a report
+# posted to one worker would never reach another's readers. Stay at one worker until
+# that state moves to a shared store.
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+# Building the index takes ~15 s on a cold start; let workers outlive a slow first request
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+
+# State each worker keeps to itself, which several workers would silently split
+PER_PROCESS_STATE = ("crowd reports and their grid index", "crowd report stream (SSE) subscribers",
+                     "the stop location join")
+
+
+def when_ready(server):
+    if server.cfg.workers > 1:
+        server.log.warning("Running %d workers, but %s live per process: a worker only sees "
+                           "its own share of them. Set WEB_CONCURRENCY=1 until they move to "
+                           "a shared store.", server.cfg.workers, ", ".join(PER_PROCESS_STATE))
+    if not preload_app:
+        return
+    from preload import freeze_for_fork, preload_shared_state
+    preload_shared_state()
+    frozen = freeze_for_fork()
+    server.log.info("Froze %d objects for copy-on-write sharing", frozen)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from preload import enable_gc_in_worker
+        enable_gc_in_worker()
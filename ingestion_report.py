@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from metrics import INGEST_FILES
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, but no forked workers sharing the file either
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# A file whose parse runs longer than this is quarantined instead of holding up the build
+INGEST_FILE_BUDGET_SECONDS = float(os.getenv('INGEST_FILE_BUDGET_SECONDS', '30'))
+QUARANTINE_PATH = os.getenv('QUARANTINE_PATH', os.path.join('data', 'quarantine.json'))
+MISSING_STAMP = 'missing'
+
+# Per-file outcomes; only OK files reach the index
+STATUS_OK = 'ok'
+STATUS_REJECTED = 'rejected_name'
+STATUS_FAILED = 'failed'
+STATUS_OVER_BUDGET = 'over_budget'
+STATUS_QUARANTINED = 'quarantined'
+FILENAME_FORMAT = '<FROM>___<TO>_from_<YYYYMMDD>_to_<YYYYMMDD>_<timetable no>.pdf'
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class Quarantine:
+    """Files that failed or ran over budget, persisted so later builds skip them.
+
+    Entries carry the file's size and mtime: replacing the PDF releases it on the next
+    build, and an admin can release it by hand once the parser is fixed. Every gunicorn
+    worker holds its own copy, so reads pick up the file again whenever it changed on
+    disk and writes re-read it under a file lock before applying their change.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or QUARANTINE_PATH
+        self.lock = threading.Lock()
+        self.entries = {}
+        # (inode, size, mtime_ns) of the file self.entries came from, MISSING_STAMP when
+        # there was no file, None before the first read
+        self.loaded_stamp = None
+
+    @contextmanager
+    def file_lock(self, exclusive):
+        if exclusive:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        try:
+            lock_file = open(f"{self.path}.lock", 'a')
+        except OSError:  # a read-only location has no other writers to wait for
+            yield
+            return
+        with lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return MISSING_STAMP
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        stamp = self.stamp()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.loaded_stamp = stamp
+
+    # Re-reads the file if another process changed it since it was last loaded; while
+    # there is no file this costs one stat
+    def refresh(self):
+        with self.lock:
+            stamp = self.stamp()
+            if stamp == self.loaded_stamp:
+                return
+            if stamp == MISSING_STAMP:
+                self.entries = {}
+                self.loaded_stamp = MISSING_STAMP
+                return
+            with self.file_lock(exclusive=False):
+                self.load()
+
+    def save(self):
+        # A temp file per writer, so concurrent saves never interleave into one file
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path), suffix='.tmp', dir=os.path.dirname(self.path) or '.')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.loaded_stamp = self.stamp()
+
+    @contextmanager
+    def update(self):
+        with self.lock, self.file_lock(exclusive=True):
+            # Unchanged since the last read also covers a location that cannot be written,
+            # where earlier additions live only in memory
+            if self.stamp() != self.loaded_stamp:
+                self.load()
+            yield self.entries
+            self.save()
+
+    # Changes whenever a file is quarantined or released
+    def version(self):
+        self.refresh()
+        entries = '\n'.join(f"{file}:{entry['fingerprint']}" for file, entry in sorted(self.entries.items()))
+        return 'q' + hashlib.sha1(entries.encode()).hexdigest()[:8]
+
+    # The entry holding the file back, or None
+    def holds(self, file, fingerprint):
+        self.refresh()
+        entry = self.entries.get(file)
+        return entry if entry is not None and entry['fingerprint'] == fingerprint else None
+
+    def add(self, file, fingerprint, status, reason):
+        try:
+            with self.update() as entries:
+                entries[file] = {
+                    'fingerprint': fingerprint,
+                    'status': status,
+                    'reason': reason,
+                    'since': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                }
+        except OSError as e:  # still held in memory, so this process keeps skipping it
+            logger.error("could not save quarantine to %s: %s", self.path, e)
+        logger.warning("quarantined %s (%s): %s", file, status, reason)
+
+    def release(self, file):
+        released = False
+        try:
+            with self.update() as entries:
+                released = entries.pop(file, None) is not None
+        except OSError as e:
+            logger.error("could not save quarantine to %s: %s", self.path, e)
+        return released
+
+
+class IngestionReport:
+    """What happened to every file in the timetable folder during one build."""
+
+    def __init__(self, budget_seconds=None):
+        self.budget_seconds = budget_seconds or INGEST_FILE_BUDGET_SECONDS
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.files = {}  # file name -> entry
+
+    def record(self, file, status, parse_seconds=None, stops=0, times=0, warnings=(), error=None):
+        self.files[file] = {
+            'file': file,
+            'status': status,
+            'parse_seconds': round(parse_seconds, 4) if parse_seconds is not None else None,
+            'stops': stops,
+            'times': times,
+            'warnings': list(warnings),
+            'error': error,
+        }
+        INGEST_FILES.inc(status)
+
+    def record_route(self, route, parse_seconds):
+        times = sum(len(record.minutes) for record in route.stops.values())
+        warnings = []
+        if not route.places:
+            warnings.append('no stops found')
+        untimed = sum(1 for record in route.stops.values() if not len(record.minutes))
+        if untimed:
+            warnings.append(f"{untimed} of {len(route.stops)} stops have no departures")
+        if parse_seconds > self.budget_seconds / 2:
+            warnings.append(f"parse took {parse_seconds:.1f} s, over half the {self.budget_seconds:.0f} s budget")
+        self.record(route.pdf, STATUS_OK, parse_seconds, len(route.places), times, warnings)
+
+    def finish(self):
+        self.finished_at = datetime.now(timezone.utc)
+        return self
+
+    def summary(self):
+        counts = {}
+        for entry in self.files.values():
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+        return counts
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': self.finished_at.isoformat(timespec='seconds') if self.finished_at else None,
+            'budget_seconds': self.budget_seconds,
+            'summary': self.summary(),
+            'files': sorted(self.files.values(), key=lambda entry: (entry['status'] == STATUS_OK, entry['file'])),
+        }
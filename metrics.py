@@ -0,0 +1,210 @@
+import bisect
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; covers sub-millisecond index lookups through minute-long LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text format."""
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [0] * (len(self.buckets) + 2)
+            series[slot] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = {labels: list(series) for labels, series in self.series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            labels = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(labels + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text format."""
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.series = {}  # label values -> count
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.series[labelvalues] = self.series.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self.series.get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            snapshot = dict(self.series)
+        for labelvalues, count in sorted(snapshot.items()):
+            lines.append(f"{self.name}{format_labels(list(zip(self.labelnames, labelvalues)))} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Histogram(name, description, labelnames, buckets)
+            return self.metrics[name]
+
+    def counter(self, name, description, labelnames=()):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Counter(name, description, labelnames)
+            return self.metrics[name]
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    'ridelogic_http_request_duration_seconds',
+    'HTTP request latency by method, route and status code.',
+    ('method', 'route', 'status'),
+)
+STAGE_SECONDS = registry.histogram(
+    'ridelogic_stage_duration_seconds',
+    'Latency of instrumented stages: ingestion, index lookups, LLM calls and scraping.',
+    ('stage', 'outcome'),
+)
+CACHE_REQUESTS = registry.counter(
+    'ridelogic_result_cache_requests_total',
+    'Memoized result lookups by cache and outcome (hit, miss).',
+    ('cache', 'result'),
+)
+INGEST_FILES = registry.counter(
+    'ridelogic_ingest_files_total',
+    'Timetable files seen by ingestion, by outcome (ok, rejected_name, failed, over_budget, quarantined).',
+    ('status',),
+)
+CACHE_EVICTIONS = registry.counter(
+    'ridelogic_result_cache_evictions_total',
+    'Memoized results dropped by cache and reason (capacity, expired, index_rebuilt).',
+    ('cache', 'reason'),
+)
+
+
+@contextmanager
+def span(stage, **fields):
+    """Times a block into the stage histogram and emits a structured DEBUG record."""
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage, outcome)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "span %s %s in %.2f ms", stage, outcome, elapsed * 1000,
+                extra={'stage': stage, 'outcome': outcome, 'duration_ms': round(elapsed * 1000, 3), **fields},
+            )
+
+
+def timed(stage):
+    """Decorator form of span(); works for both plain and async functions."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+STANDARD_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, including span fields passed through extra=."""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, log_format=None):
+    """Root logging from LOG_LEVEL (default INFO) and LOG_FORMAT ('text' or 'json')."""
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = log_format or os.getenv('LOG_FORMAT', 'text')
+    handler = logging.StreamHandler()
+    if log_format == 'json':
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    logging.basicConfig(level=level, handlers=[handler])
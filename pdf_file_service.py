@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import os
+import re
+import stat as stat_module
+import threading
+from flask import send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import zstandard
+except ImportError:  # zstd variants are optional
+    zstandard = None
+
+# Timetable PDFs carry their effective date and timetable number in the name,
+# so a given filename always refers to the same timetable
+VERSIONED_PDF_PATTERN = re.compile(r".+___.+_from_\d+_to_\d+_\d+\.pdf$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# A variant is only kept when it saves at least this fraction of the original size
+MIN_VARIANT_SAVING = 0.05
+
+
+class PDFFileService:
+    def __init__(self, directory='pdf_downloads', variant_folder='pdf_variants'):
+        self.directory = os.path.abspath(directory)
+        self.variant_folder = os.path.abspath(variant_folder)
+        self.hashes = {}  # filename -> (size, mtime_ns, sha256)
+        self.variants = {}  # (filename, encoding) -> (variant path, source size, source mtime_ns)
+        self.lock = threading.Lock()
+        self.load_variants()
+
+    def resolve(self, filename):
+        path = safe_join(self.directory, filename)
+        if path is None:
+            raise NotFound()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise NotFound()
+        if not stat_module.S_ISREG(stat.st_mode):
+            raise NotFound()
+        return path, stat
+
+    # Content hash, recomputed only when the file's size or mtime changes
+    def content_hash(self, filename, path, stat):
+        cached = self.hashes.get(filename)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:32]
+        with self.lock:
+            self.hashes[filename] = (stat.st_size, stat.st_mtime_ns, digest)
+        return digest
+
+    def choose_variant(self, filename, request, stat):
+        # Byte ranges always address the identity representation
+        if request.range is not None:
+            return None, None
+        accepted = request.accept_encodings
+        for encoding in ('zstd', 'gzip'):
+            entry = self.variants.get((filename, encoding))
+            if not entry or accepted[encoding] <= 0:
+                continue
+            variant, size, mtime_ns = entry
+            # A PDF replaced since the variant was registered is served as is until rebuilt
+            if size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+                with self.lock:
+                    self.variants.pop((filename, encoding), None)
+                continue
+            return encoding, variant
+        return None, None
+
+    def send_pdf(self, filename, request, as_attachment=False):
+        path, stat = self.resolve(filename)
+        etag = self.content_hash(filename, path, stat)
+        encoding, variant = self.choose_variant(filename, request, stat)
+
+        if encoding:
+            response = send_file(
+                variant,
+                mimetype='application/pdf',
+                as_attachment=as_attachment,
+                download_name=os.path.basename(filename),
+                etag=f"{etag}-{encoding}",
+                conditional=True,
+            )
+            response.headers['Content-Encoding'] = encoding
+        else:
+            # conditional=True gives If-None-Match/If-Modified-Since and Range support
+            response = send_file(
+                path,
+                mimetype='application/pdf',
+                as_attachment=as_attachment,
+                etag=etag,
+                conditional=True,
+            )
+
+        response.headers['Vary'] = 'Accept-Encoding'
+        if VERSIONED_PDF_PATTERN.match(os.path.basename(filename)):
+            response.headers['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def variant_path(self, filename, encoding):
+        suffix = '.zst' if encoding == 'zstd' else '.gz'
+        return os.path.join(self.variant_folder, filename + suffix)
+
+    # Registers variants on disk that are at least as new as their source PDF, along with
+    # the source's size and mtime so a later replacement of the PDF retires them
+    def load_variants(self):
+        variants = {}
+        if os.path.isdir(self.variant_folder) and os.path.isdir(self.directory):
+            for filename in os.listdir(self.directory):
+                source = os.stat(os.path.join(self.directory, filename))
+                for encoding in ('gzip', 'zstd'):
+                    variant = self.variant_path(filename, encoding)
+                    if os.path.isfile(variant) and os.stat(variant).st_mtime_ns >= source.st_mtime_ns:
+                        variants[(filename, encoding)] = (variant, source.st_size, source.st_mtime_ns)
+        self.variants = variants
+        return variants
+
+    # Pre-builds compressed copies of every PDF into the variant store
+    def build_variants(self):
+        if not os.path.isdir(self.directory):
+            return self.load_variants()
+        os.makedirs(self.variant_folder, exist_ok=True)
+        compressors = {'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=19)
+            compressors['zstd'] = compressor.compress
+
+        for filename in os.listdir(self.directory):
+            source = os.path.join(self.directory, filename)
+            if not os.path.isfile(source):
+                continue
+            with open(source, 'rb') as f:
+                data = f.read()
+            for encoding, compress in compressors.items():
+                variant = self.variant_path(filename, encoding)
+                compressed = compress(data)
+                if len(compressed) <= len(data) * (1 - MIN_VARIANT_SAVING):
+                    with open(variant, 'wb') as f:
+                        f.write(compressed)
+                elif os.path.exists(variant):
+                    os.remove(variant)
+        return self.load_variants()
+
+
+if __name__ == "__main__":
+    variants = PDFFileService().build_variants()
+    print(f"Built {len(variants)} PDF variants")
@@ -1,208 +1,328 @@
-import os
-import re
-import requests
-from bs4 import BeautifulSoup
-import PyPDF2
-import fitz  # PyMuPDF
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-
-class PDFService:
-    def __init__(self, download_folder='pdf_downloads'):
-        self.url = 'https://www.gabs.co.za/Timetable.aspx'
-        self.file_url = 'https://www.gabs.co.za'
-        self.download_folder = download_folder
-        os.makedirs(self.download_folder, exist_ok=True)
-
-    def fetch_pdf_links(self):
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(self.url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        buttons = soup.find_all('button', {'title': 'Download'}, onclick=True)
-        pdf_urls = []
-        for button in buttons:
-            pdf_match = re.search(r"window\.open\(['\"](.*?)['\"]", button['onclick'])
-            if pdf_match:
-                pdf_url = pdf_match.group(1)
-                if not pdf_url.startswith('http'):
-                    pdf_url = f"{self.file_url}/{pdf_url.lstrip('/')}"
-                pdf_urls.append(pdf_url)
-        return pdf_urls
-    
-    def fetch_pdf_links_with_param(self, letter = 'A'):
-        session = requests.Session()
-        headers = {
-            'User-Agent': 'Mozilla/5.0'
-        }
-
-        # Step 1: Initial GET to extract hidden form fields
-        response = session.get(self.url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        def get_field(name):
-            field = soup.find('input', {'name': name})
-            return field['value'] if field else ''
-
-        viewstate = get_field('__VIEWSTATE')
-        viewstategenerator = get_field('__VIEWSTATEGENERATOR')
-        eventvalidation = get_field('__EVENTVALIDATION')  # optional but often required
-
-        # Step 2: POST to simulate clicking the control with __EVENTTARGET='M'
-        payload = {
-            '__EVENTTARGET': letter,
-            '__EVENTARGUMENT': '',
-            '__VIEWSTATE': viewstate,
-            '__VIEWSTATEGENERATOR': viewstategenerator,
-            '__EVENTVALIDATION': eventvalidation,
-        }
-
-        post_response = session.post(self.url, data=payload, headers=headers)
-        post_soup = BeautifulSoup(post_response.text, 'html.parser')
-
-        # Step 3: Extract PDF links from the onclick JS
-        buttons = post_soup.find_all('button', {'title': 'Download'}, onclick=True)
-        pdf_urls = []
-
-        for button in buttons:
-            pdf_match = re.search(r"window\.open\(['\"](.*?)['\"]", button['onclick'])
-            if pdf_match:
-                pdf_url = pdf_match.group(1)
-                if not pdf_url.startswith('http'):
-                    pdf_url = f"{self.file_url}/{pdf_url.lstrip('/')}"
-                pdf_urls.append(pdf_url)
-
-        return pdf_urls
-    
-
-
-    def download_pdfs(self):
-        letters = list("ABCDEFHKLMNOPRSTUVW")
-
-        def download_pdf(url):
-            try:
-                pdf_name = url.split('/')[-1]
-                pdf_path = os.path.join(self.download_folder, pdf_name)
-                response = requests.get(url, stream=True)
-                if response.status_code == 200:
-                    with open(pdf_path, 'wb') as pdf_file:
-                        for chunk in response.iter_content(chunk_size=1024):
-                            pdf_file.write(chunk)
-                    return pdf_path
-            except Exception as e:
-                print(f"Failed to download {url}: {e}")
-            return None
-
-        all_urls = []
-
-        # Collect all PDF URLs
-        for letter in letters:
-            urls = self.fetch_pdf_links_with_param(letter=letter)
-            all_urls.extend(urls)
-
-        # Download in parallel
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_url = {executor.submit(download_pdf, url): url for url in all_urls}
-
-            for future in as_completed(future_to_url):
-                result = future.result()
-                if result:
-                    print(f"Downloaded: {result}")
-                else:
-                    print(f"Failed: {future_to_url[future]}")
-
-        return all_urls
-
-    def list_downloaded_pdfs(self):
-        return [f for f in os.listdir(self.download_folder) if os.path.isfile(os.path.join(self.download_folder, f))]
-
-class PlaceMapService:
-    def __init__(self):
-        self.places_map = []
-        self.lock = threading.Lock()
-
-    def add_place(self, place):
-        with self.lock:
-            existing_place = next((p for p in self.places_map if p['name'] == place['name']), None)
-            if existing_place:
-                existing_place['times'] = list(set(existing_place['times'] + place['times']))
-            else:
-                self.places_map.append(place)
-
-    def extract_day_from_text(self, text):
-        days = [
-            "MONDAYS TO FRIDAYS", "Saturday", "Sunday"
-        ]
-        daysMap = {
-            "MONDAYS TO FRIDAYS":'wd', "Saturday":'wsa', "Sunday":'wsu'
-        }
-        text_to_ignore = "a  - Mondays,Tuesdays,Wednesdays,Thursdays"
-        
-        # Make text lowercase for case-insensitive matching
-        text_lower = text.lower()
-        if text_lower == text_to_ignore:
-            return None
-        for day in days:
-            if re.search(rf'\b{day.lower()}\b', text_lower):
-               daysMap[day]  # Return in title case even if matched in lowercase
-        for day in days:
-            if day.lower() in text_lower:
-                return daysMap[day]  # Return in title case even if matched in lowercase
-
-        return None
-    
-    def flag_times(self, times, flag):
-        return [time + flag for time in times]
-
-    def process_text_chunk(self, text, places_found):
-        rows = text.split('\n')
-        day_flag = 'w'
-        prev = ''
-        for row in rows:
-            is_day = self.extract_day_from_text(row)
-            if is_day: #adds a flag to the time
-                day_flag = is_day
-            inbetweens = row.split('|')
-            
-            for i, value in enumerate(inbetweens):
-                value = value.strip()
-                if self.is_place(value):
-                    times_flagged= self.flag_times(inbetweens[i + 1:i + 23], day_flag)
-                    place = {
-                        'name': value,
-                        'times': times_flagged,
-                        'next': inbetweens[i + 24] if i + 24 < len(inbetweens) else None,
-                        'prev': prev
-                    }
-                    self.add_place(place)
-                    with self.lock:
-                        if value not in places_found:
-                            prev = value
-                            places_found.append(value)
-
-    def extract_text_from_pdf(self, pdf_path):
-        places_found = []
-        pdf_path = os.path.join('pdf_downloads', pdf_path)
-        
-        with fitz.open(pdf_path) as doc:
-            threads = []
-            for page in doc:
-                text = page.get_text("text") + '\n'
-                thread = threading.Thread(target=self.process_text_chunk, args=(text, places_found))
-                thread.start()
-                threads.append(thread)
-            
-            for thread in threads:
-                thread.join()
-        
-        return places_found
-
-    def is_place(self, text):
-        return not (':' in text or 'via' in text or '-' in text or text.strip() == '')
-    
-
-# print('Initializing download')
-# pdf_service = PDFService()
-# pdf_service.download_pdfs()
-# print('Download complete!')
-
+import os
+import re
+import logging
+import requests
+from bs4 import BeautifulSoup
+import PyPDF2
+import fitz  # PyMuPDF
+import threading
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import timed
+from timetable_time import parse_time
+from row_classifier import ROW_DAY, ROW_STOP, row_classifier
+
+# 'text' splits get_text("text") lines on '|'; 'words' clusters get_text("words") by geometry
+DEFAULT_PARSE_ENGINE = os.getenv('PDF_PARSE_ENGINE', 'text')
+# Bump whenever a parser change alters its output; caches of parsed timetables key on it
+PARSER_VERSION = 5
+
+logger = logging.getLogger(__name__)
+
+
+class PDFService:
+    def __init__(self, download_folder='pdf_downloads'):
+        self.url = 'https://www.gabs.co.za/Timetable.aspx'
+        self.file_url = 'https://www.gabs.co.za'
+        self.download_folder = download_folder
+        os.makedirs(self.download_folder, exist_ok=True)
+
+    @timed('scrape.fetch_pdf_links')
+    def fetch_pdf_links(self):
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        response = requests.get(self.url, headers=headers)
+        return self.parse_pdf_links(response.text)
+
+    @timed('scrape.fetch_pdf_links')
+    async def fetch_pdf_links_async(self, client):
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        response = await client.get(self.url, headers=headers)
+        return self.parse_pdf_links(response.text)
+
+    def parse_pdf_links(self, html):
+        soup = BeautifulSoup(html, 'html.parser')
+        buttons = soup.find_all('button', {'title': 'Download'}, onclick=True)
+        pdf_urls = []
+        for button in buttons:
+            pdf_match = re.search(r"window\.open\(['\"](.*?)['\"]", button['onclick'])
+            if pdf_match:
+                pdf_url = pdf_match.group(1)
+                if not pdf_url.startswith('http'):
+                    pdf_url = f"{self.file_url}/{pdf_url.lstrip('/')}"
+                pdf_urls.append(pdf_url)
+        return pdf_urls
+    
+    @timed('scrape.fetch_pdf_links_with_param')
+    def fetch_pdf_links_with_param(self, letter = 'A'):
+        session = requests.Session()
+        headers = {
+            'User-Agent': 'Mozilla/5.0'
+        }
+
+        # Step 1: Initial GET to extract hidden form fields
+        response = session.get(self.url, headers=headers)
+        soup = BeautifulSoup(response.text, 'html.parser')
+
+        def get_field(name):
+            field = soup.find('input', {'name': name})
+            return field['value'] if field else ''
+
+        viewstate = get_field('__VIEWSTATE')
+        viewstategenerator = get_field('__VIEWSTATEGENERATOR')
+        eventvalidation = get_field('__EVENTVALIDATION')  # optional but often required
+
+        # Step 2: POST to simulate clicking the control with __EVENTTARGET='M'
+        payload = {
+            '__EVENTTARGET': letter,
+            '__EVENTARGUMENT': '',
+            '__VIEWSTATE': viewstate,
+            '__VIEWSTATEGENERATOR': viewstategenerator,
+            '__EVENTVALIDATION': eventvalidation,
+        }
+
+        post_response = session.post(self.url, data=payload, headers=headers)
+        post_soup = BeautifulSoup(post_response.text, 'html.parser')
+
+        # Step 3: Extract PDF links from the onclick JS
+        buttons = post_soup.find_all('button', {'title': 'Download'}, onclick=True)
+        pdf_urls = []
+
+        for button in buttons:
+            pdf_match = re.search(r"window\.open\(['\"](.*?)['\"]", button['onclick'])
+            if pdf_match:
+                pdf_url = pdf_match.group(1)
+                if not pdf_url.startswith('http'):
+                    pdf_url = f"{self.file_url}/{pdf_url.lstrip('/')}"
+                pdf_urls.append(pdf_url)
+
+        return pdf_urls
+    
+
+
+    @timed('scrape.download_pdfs')
+    def download_pdfs(self):
+        letters = list("ABCDEFHKLMNOPRSTUVW")
+
+        def download_pdf(url):
+            try:
+                pdf_name = url.split('/')[-1]
+                pdf_path = os.path.join(self.download_folder, pdf_name)
+                response = requests.get(url, stream=True)
+                if response.status_code == 200:
+                    with open(pdf_path, 'wb') as pdf_file:
+                        for chunk in response.iter_content(chunk_size=1024):
+                            pdf_file.write(chunk)
+                    return pdf_path
+            except Exception as e:
+                logger.warning("Failed to download %s: %s", url, e)
+            return None
+
+        all_urls = []
+
+        # Collect all PDF URLs
+        for letter in letters:
+            urls = self.fetch_pdf_links_with_param(letter=letter)
+            all_urls.extend(urls)
+
+        # Download in parallel
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            future_to_url = {executor.submit(download_pdf, url): url for url in all_urls}
+
+            for future in as_completed(future_to_url):
+                result = future.result()
+                if result:
+                    logger.debug("Downloaded: %s", result)
+                else:
+                    logger.warning("Failed: %s", future_to_url[future])
+
+        return all_urls
+
+    def list_downloaded_pdfs(self):
+        return [f for f in os.listdir(self.download_folder) if os.path.isfile(os.path.join(self.download_folder, f))]
+
+class PlaceMapService:
+    def __init__(self, engine=None):
+        self.places_map = []
+        self.places_by_name = {}
+        self.lock = threading.Lock()
+        self.engine = engine or DEFAULT_PARSE_ENGINE
+
+    def add_place(self, place):
+        with self.lock:
+            self.merge_place(place)
+
+    # Callers that share the service across threads go through add_place
+    def merge_place(self, place):
+        existing_place = self.places_by_name.get(place['name'])
+        if existing_place:
+            # Order-preserving de-duplication keeps the merged times reproducible across runs
+            existing_place['times'] = list(dict.fromkeys(existing_place['times'] + place['times']))
+            existing_place['encoded_times'] = sorted(set(existing_place['encoded_times'] + place['encoded_times']))
+        else:
+            self.places_by_name[place['name']] = place
+            self.places_map.append(place)
+
+    # Day flag ('wd', 'wsa', 'wsu') for a day header row, otherwise None
+    def extract_day_from_text(self, text):
+        kind, day = row_classifier.classify(text)
+        return day if kind == ROW_DAY else None
+
+    def flag_times(self, times, flag):
+        return [time + flag for time in times]
+
+    # Integer form of flagged times: sorted, de-duplicated TimetableTime tuples
+    def encode_times(self, flagged_times):
+        return sorted({encoded for encoded in map(parse_time, flagged_times) if encoded})
+
+    # Map stage: one page's stop rows, in row order, as (name, flagged times, next) tuples.
+    # Pure, so pages can be parsed in any order or in parallel.
+    def parse_page(self, text):
+        fragment = []
+        day_flag = 'w'
+        for row in text.split('\n'):
+            kind, day = row_classifier.classify(row)
+            if kind == ROW_DAY: #adds a flag to the time
+                day_flag = day
+            if kind != ROW_STOP:
+                continue  # titles, legends and legal text hold no stops
+            inbetweens = row.split('|')
+
+            for i, value in enumerate(inbetweens):
+                value = value.strip()
+                if self.is_place(value):
+                    fragment.append((
+                        value,
+                        self.flag_times(inbetweens[i + 1:i + 23], day_flag),
+                        inbetweens[i + 24] if i + 24 < len(inbetweens) else None,
+                    ))
+        return fragment
+
+    # Reduce stage: folds page fragments in page order. Each page restarts the prev chain,
+    # which only advances on a stop not seen on an earlier row or page.
+    def merge_fragments(self, fragments):
+        places_found = []
+        seen = set()
+        for fragment in fragments:
+            prev = ''
+            for name, times_flagged, next_place in fragment:
+                self.merge_place({
+                    'name': name,
+                    'times': times_flagged,
+                    'encoded_times': self.encode_times(times_flagged),
+                    'next': next_place,
+                    'prev': prev
+                })
+                if name not in seen:
+                    seen.add(name)
+                    prev = name
+                    places_found.append(name)
+        return places_found
+
+    @timed('ingest.parse_pdf')
+    def extract_text_from_pdf(self, pdf_path):
+        if self.engine == 'words':
+            return self.extract_words_from_pdf(pdf_path)
+
+        pdf_path = os.path.join('pdf_downloads', pdf_path)
+        with fitz.open(pdf_path) as doc:
+            texts = [page.get_text("text") + '\n' for page in doc]
+
+        # Pages are parsed independently and merged in page order, so the result does not
+        # depend on scheduling; files are already parsed in parallel by ScheduleService
+        fragments = [self.parse_page(text) for text in texts]
+        with self.lock:
+            return self.merge_fragments(fragments)
+
+    # Geometry engine: one get_text("words") call per page. Words arrive grouped by
+    # PyMuPDF's layout analysis into (block, line) rows in left-to-right order, so a
+    # row is split into columns by its '|' rules in a single pass over its words,
+    # with no per-cell regex, string re-splitting or positional offsets.
+    def extract_words_from_pdf(self, pdf_path):
+        places_found = []
+        pdf_path = os.path.join('pdf_downloads', pdf_path)
+
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                for table in self.extract_tables_from_words(page.get_text("words")):
+                    self.add_table(table, places_found)
+
+        return places_found
+
+    # Returns the page's tables as lists of (stop name, [cell, ...], day flag) rows
+    def extract_tables_from_words(self, words):
+        tables = []
+        table = []
+        day_flag = 'w'
+
+        for _, line_words in groupby(words, key=itemgetter(5, 6)):
+            texts = [word[4] for word in line_words]
+            if texts[0][0] == '|':
+                stop_row = self.split_row_by_rules(texts)
+                if stop_row:
+                    table.append((stop_row[0], stop_row[1], day_flag))
+                continue
+
+            # Any line outside a table ends it and may carry a new day header
+            if table:
+                tables.append(table)
+                table = []
+            is_day = self.extract_day_from_text(' '.join(texts))
+            if is_day:
+                day_flag = is_day
+
+        if table:
+            tables.append(table)
+        return tables
+
+    # Splits a row's words into the cells between its '|' rules; a rule can be a
+    # word of its own or glued to times, as in '|06:30b|06:30a|'
+    def split_row_by_rules(self, texts):
+        cells = [[]]
+        for text in texts:
+            if text == '|':
+                cells.append([])
+            elif text == '--':
+                continue  # empty trip slot
+            elif '|' in text:
+                pieces = text.split('|')
+                if pieces[0]:
+                    cells[-1].append(pieces[0])
+                for piece in pieces[1:]:
+                    cells.append([piece] if piece else [])
+            else:
+                cells[-1].append(text)
+
+        # cells[0] is left of the first rule and cells[-1] right of the last
+        if len(cells) < 3:
+            return None
+        name = ' '.join(cells[1])
+        if not name.strip('-'):
+            return None
+        return name, [' '.join(cell) for cell in cells[2:-1]]
+
+    def add_table(self, table, places_found):
+        prev = places_found[-1] if places_found else ''
+        for position, (name, cells, day_flag) in enumerate(table):
+            encoded_times = self.encode_times([cell + day_flag for cell in cells if cell])
+            place = {
+                'name': name,
+                'times': [encoded.legacy() for encoded in encoded_times],
+                'encoded_times': encoded_times,
+                'next': table[position + 1][0] if position + 1 < len(table) else None,
+                'prev': prev
+            }
+            self.add_place(place)
+            if name not in places_found:
+                prev = name
+                places_found.append(name)
+
+    def is_place(self, text):
+        return not (':' in text or 'via' in text or '-' in text or text.strip() == '')
+    
+
+# print('Initializing download')
+# pdf_service = PDFService()
+# pdf_service.download_pdfs()
+# print('Download complete!')
+
@@ -0,0 +1,48 @@
+import gc
+import logging
+import os
+import time
+from schedule_service import ScheduleService
+
+logger = logging.getLogger(__name__)
+
+# The spaCy pipeline behind scrape.py's /interpret is ~50 MB and app:app never loads it;
+# set PRELOAD_NLP=1 only when serving scrape:app
+PRELOAD_NLP = os.getenv('PRELOAD_NLP', '0') == '1'
+
+
+def preload_shared_state():
+    """Builds the state every worker only reads (the timetable index with its stop catalog
+    and columnar stop_times table, and with PRELOAD_NLP the NLP resolver) so forked
+    workers inherit it."""
+    start = time.perf_counter()
+    index = ScheduleService().get_index(recheck=True)
+    index.stop_times()
+    logger.info("preloaded index %s: %d routes, %d stops in %.1f s",
+                index.version, len(index.routes), len(index.catalog), time.perf_counter() - start)
+
+    if PRELOAD_NLP:
+        try:
+            import nlp_test  # loads the spaCy pipeline at import
+            nlp_test.extract_possible_routes("from cape town to bellville")
+        except (ImportError, OSError) as e:  # spaCy or its model is not installed
+            logger.info("NLP resolver not preloaded: %s", e)
+    return index
+
+
+def freeze_for_fork():
+    """Moves everything allocated so far into the permanent GC generation.
+
+    Collections in a worker would otherwise write gc bookkeeping into every tracked
+    object inherited from the master, un-sharing the pages they live on. Collecting
+    first keeps garbage out of the frozen set; the master then stays uncollected so
+    it does not punch new holes into those pages before the next fork.
+    """
+    gc.collect()
+    gc.disable()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def enable_gc_in_worker():
+    gc.enable()
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from io import BytesIO
+import fitz  # PyMuPDF
+from werkzeug.exceptions import NotFound
+from pdf_service import PARSER_VERSION, PlaceMapService
+
+try:
+    from PIL import Image
+except ImportError:  # WebP output needs Pillow; PNG is always available
+    Image = None
+
+DEFAULT_RENDER_CACHE_MAX_BYTES = 200 * 1024 * 1024
+MIN_RENDER_WIDTH = 100
+MAX_RENDER_WIDTH = 2000
+
+
+class DiskLRUCache:
+    """Byte blobs on disk, evicted least-recently-used first once over a size budget."""
+
+    def __init__(self, folder='render_cache', max_bytes=None):
+        self.folder = folder
+        self.max_bytes = max_bytes or int(os.getenv('RENDER_CACHE_MAX_BYTES', DEFAULT_RENDER_CACHE_MAX_BYTES))
+        self.sizes = {}  # key -> size in bytes
+        self.lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                self.sizes[entry.name] = entry.stat().st_size
+
+    def path_for(self, key):
+        return os.path.join(self.folder, key)
+
+    def get(self, key):
+        if key not in self.sizes:
+            return None
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # mtime doubles as the recency stamp
+        except OSError:
+            with self.lock:
+                self.sizes.pop(key, None)
+            return None
+        return data
+
+    def put(self, key, data):
+        path = self.path_for(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.sizes[key] = len(data)
+            if sum(self.sizes.values()) > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        entries = []
+        for key in self.sizes:
+            try:
+                entries.append((os.path.getmtime(self.path_for(key)), key))
+            except OSError:
+                entries.append((0, key))
+        total = sum(self.sizes.values())
+        for _, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            total -= self.sizes.pop(key)
+            try:
+                os.remove(self.path_for(key))
+            except OSError:
+                pass
+
+
+class RenderService:
+    def __init__(self, pdf_file_service, cache=None):
+        self.pdf_file_service = pdf_file_service
+        self.cache = cache or DiskLRUCache()
+
+    def content_hash(self, filename):
+        path, stat = self.pdf_file_service.resolve(filename)
+        return path, self.pdf_file_service.content_hash(filename, path, stat)
+
+    # Returns (image bytes, mimetype, cache key) for one page of a timetable
+    def render_page(self, filename, page_number, image_format='png', width=480):
+        path, digest = self.content_hash(filename)
+        width = max(MIN_RENDER_WIDTH, min(int(width), MAX_RENDER_WIDTH))
+        if image_format == 'webp' and Image is None:
+            image_format = 'png'
+        key = f"{digest}-p{page_number}-w{width}.{image_format}"
+
+        data = self.cache.get(key)
+        if data is None:
+            with fitz.open(path) as doc:
+                if page_number < 1 or page_number > len(doc):
+                    raise NotFound(description="Page not found")
+                page = doc[page_number - 1]
+                zoom = width / page.rect.width
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                if image_format == 'webp':
+                    image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+                    data = self.encode_webp(image)
+                else:
+                    data = pix.tobytes('png')
+            self.cache.put(key, data)
+        return data, f"image/{image_format}", key
+
+    def encode_webp(self, image):
+        buffer = BytesIO()
+        image.save(buffer, format='WEBP', quality=80)
+        return buffer.getvalue()
+
+    # Compact JSON of a timetable's stops and times, in the order they appear
+    def table_view(self, filename):
+        path, digest = self.content_hash(filename)
+        place_service = PlaceMapService()
+        # The parser's output changes with its version and engine, not just with the PDF
+        key = f"{digest}-table-{place_service.engine}-v{PARSER_VERSION}.json"
+
+        data = self.cache.get(key)
+        if data is None:
+            places = place_service.extract_text_from_pdf(filename)
+            places_by_name = {}
+            for place in place_service.places_map:
+                places_by_name.setdefault(place['name'], place)  # first wins, as in Route.add_places_map
+            with fitz.open(path) as doc:
+                page_count = len(doc)
+            stops = []
+            for name in places:
+                place = places_by_name.get(name, {})
+                stops.append({
+                    'name': name,
+                    'times': place.get('times', []),
+                    'next': place.get('next'),
+                    'prev': place.get('prev'),
+                })
+            payload = {'pdf': os.path.basename(filename), 'pages': page_count, 'stops': stops}
+            data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            self.cache.put(key, data)
+        return data, 'application/json', key
@@ -0,0 +1,112 @@
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# Profiling is off unless an admin token is configured
+PROFILE_ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_SECONDS = float(os.getenv('PROFILE_INTERVAL_MS', '5')) / 1000
+# Sampling stops after this long even if the request is still running
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '120'))
+PROFILE_NAME_PATTERN = re.compile(r'^[\w.-]+\.folded$')
+
+
+def profiling_requested(headers, args):
+    """True when a request asks to be profiled and carries the admin token."""
+    if not PROFILE_ADMIN_TOKEN:
+        return False
+    if headers.get('X-Profile') != '1' and args.get('profile') != '1':
+        return False
+    return is_admin(headers)
+
+
+def is_admin(headers):
+    token = headers.get('X-Admin-Token', '')
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+
+def frame_label(frame):
+    code = frame.f_code
+    # ';' separates frames in the folded format, so it may not appear in a label
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+class RequestProfiler:
+    """Samples the stacks of one request's thread, plus any thread started while it
+    runs (the ingestion pool, per-page parse threads), into folded stacks that
+    flamegraph.pl, speedscope and inferno read directly."""
+
+    def __init__(self, label, thread_prefixes=(), interval=None):
+        self.label = label
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.interval = interval or PROFILE_INTERVAL_SECONDS
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self, thread_id=None):
+        self.target = thread_id or threading.get_ident()
+        self.existing = {thread.ident for thread in threading.enumerate()}
+        self.started_at = time.perf_counter()
+        self.sampler = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+        self.sampler.start()
+        return self
+
+    def is_tracked(self, thread_id, names):
+        if thread_id == self.target:
+            return True
+        if thread_id == self.sampler.ident:
+            return False
+        name = names.get(thread_id, '')
+        return thread_id not in self.existing or (self.thread_prefixes and name.startswith(self.thread_prefixes))
+
+    def run(self):
+        deadline = self.started_at + PROFILE_MAX_SECONDS
+        while not self.stopped.wait(self.interval) and time.perf_counter() < deadline:
+            self.sample()
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if not self.is_tracked(thread_id, names):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)).replace(';', ','))
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        self.elapsed = time.perf_counter() - self.started_at
+        return self
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    # Writes the folded stacks under PROFILE_DIR and returns the file name
+    def save(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r'[^\w-]+', '_', self.label).strip('_') or 'request'
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{uuid.uuid4().hex[:8]}.folded"
+        with open(os.path.join(PROFILE_DIR, name), 'w') as f:
+            f.write(self.folded())
+        return name
+
+
+def profile_path(name):
+    """Path of a stored profile, or None for names that are not profile files."""
+    if not PROFILE_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import Response
+from metrics import CACHE_EVICTIONS, CACHE_REQUESTS
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+class PrecomputedResponse:
+    """A JSON body serialized and compressed once, served with strong ETags."""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Each encoding is a different representation, so each gets its own strong ETag
+        self.variants = {'identity': (self.body, digest)}
+        self.variants['gzip'] = (gzip.compress(self.body, compresslevel=9, mtime=0), f"{digest}-gz")
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(self.body, quality=11), f"{digest}-br")
+
+    def choose_encoding(self, request):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accepted[encoding] > 0:
+                return encoding
+        return 'identity'
+
+    def to_response(self, request):
+        encoding = self.choose_encoding(request)
+        body, etag = self.variants[encoding]
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+class CatalogCache:
+    """Precomputed responses that are dropped whenever the timetable index version changes."""
+
+    def __init__(self):
+        self.version = None
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def get(self, name, version, build_payload):
+        with self.lock:
+            if version != self.version:
+                self.responses = {}
+                self.version = version
+            response = self.responses.get(name)
+        if response is None:
+            response = PrecomputedResponse(build_payload())
+            with self.lock:
+                if version == self.version:
+                    self.responses[name] = response
+        return response
+
+
+class ResultCache:
+    """Bounded LRU memo of computed results, each kept for at most `ttl` seconds and all
+    dropped whenever the timetable index version changes."""
+
+    def __init__(self, name, maxsize=1024, ttl=300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = None
+        self.entries = OrderedDict()  # key -> (expires_at, result)
+        self.lock = threading.Lock()
+
+    def get(self, key, version, compute):
+        now = time.monotonic()
+        with self.lock:
+            if version != self.version:
+                if self.entries:
+                    CACHE_EVICTIONS.inc(self.name, 'index_rebuilt', amount=len(self.entries))
+                self.entries = OrderedDict()
+                self.version = version
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                CACHE_EVICTIONS.inc(self.name, 'expired')
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                CACHE_REQUESTS.inc(self.name, 'hit')
+                return entry[1]
+        CACHE_REQUESTS.inc(self.name, 'miss')
+
+        # Computed outside the lock; concurrent misses on one key just compute it twice
+        result = compute()
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = (now + self.ttl, result)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+                    CACHE_EVICTIONS.inc(self.name, 'capacity')
+        return result
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': CACHE_REQUESTS.value(self.name, 'hit'),
+            'misses': CACHE_REQUESTS.value(self.name, 'miss'),
+        }
@@ -0,0 +1,54 @@
+import re
+
+ROW_STOP = 'stop'
+ROW_DAY = 'day'
+ROW_FOOTNOTE = 'footnote'
+ROW_HEADER = 'header'
+
+# Day headers in priority order, matching the flags PlaceMapService attaches to times
+DAY_FLAGS = ('wd', 'wsa', 'wsu')
+DAY_PATTERN = re.compile(r'(mondays to fridays)|(saturday)|(sunday)', re.IGNORECASE)
+# Abbreviation legend lines such as "a  - Mondays,Tuesdays,Wednesdays,Thursdays"
+FOOTNOTE_PATTERN = re.compile(r'[a-z]\s+-\s')
+
+# Place names that ScheduleService.clean_places rejects, compiled into one pattern
+INVALID_PLACE_PATTERN = re.compile('|'.join(f'(?:{pattern})' for pattern in (
+    r"^.*\b(STANDARD|SATURDAYS|SUNDAYS|OPERATED|REG|CONDITIONS|CARRIAGE|WEBSITE|LIABLE|ANY|LOSS|INCONVENIENCE|FAILURE|MAINTAIN|VEHICLES|TIMETABLE).*", # Regex for common invalid phrases
+    r"^[A-Za-z]+\.[A-Za-z]+$",  # Abbreviations like A.D.E.
+    r"^[A-Za-z]+\s*[A-Za-z]+$", # Single word place names (Optional if you want to keep these)
+    r"\(",  # If you want to remove places with parenthesis (like "MAMRE (PARADISE RD)")
+    r"^\s*$",  # Remove empty strings
+)))
+
+
+class RowClassifier:
+    """Labels a timetable text row as a stop row, day header, footnote or other header text."""
+
+    def classify(self, row):
+        """Returns (kind, day flag); the day flag is only set for ROW_DAY rows."""
+        stripped = row.lstrip()
+        if stripped.startswith('|'):
+            return ROW_STOP, None
+        if FOOTNOTE_PATTERN.match(stripped):
+            return ROW_FOOTNOTE, None
+        day = self.day_flag(stripped)
+        if day:
+            return ROW_DAY, day
+        return ROW_HEADER, None
+
+    # One scan of the row; when several day names appear the highest-priority one wins
+    def day_flag(self, text):
+        best = None
+        for match in DAY_PATTERN.finditer(text):
+            group = match.lastindex - 1
+            if best is None or group < best:
+                best = group
+                if best == 0:
+                    break
+        return DAY_FLAGS[best] if best is not None else None
+
+    def is_valid_place(self, place):
+        return INVALID_PLACE_PATTERN.match(place) is None
+
+
+row_classifier = RowClassifier()
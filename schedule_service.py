@@ -1,232 +1,634 @@
-import re
-import os
-from flask import jsonify
-from pdf_service import PDFService, PlaceMapService
-import concurrent.futures
-
-class Route:
-    def __init__(self, from_route, to_route, pdf, effective_date, time_table_no):
-        self.from_route = from_route
-        self.to_route = to_route
-        self.pdf = pdf
-        self.effective_date = effective_date
-        self.time_table_no = time_table_no
-        self.places = []
-        self.places_map = {}
-
-    def __str__(self):
-        return f"Route({self.from_route} <-> {self.to_route}, Effective Date: {self.effective_date}, Time Table No: {self.time_table_no})"
-
-    def add_places(self, places):
-        self.places = places
-
-    def add_places_map(self, places_map):
-        self.places_map = places_map
-
-    def getRouteName(self):
-        return f"{self.from_route} <-> {self.to_route}"
-
-    def hasPlace(self, placeName):
-        return placeName.upper() in self.places
-
-    def getPlaceTimes(self, placeName):
-        if self.hasPlace(placeName):
-            # Find the place in places_map by name and return its times
-            for place in self.places_map:
-                if place.get('name') == placeName:
-                    return place.get('times', [])
-        return []
-    
-    def getPlaceDetails(self, placeName):
-        if self.hasPlace(placeName):
-            # Find the place in places_map by name and return its times
-            for place in self.places_map:
-                if place.get('name') == placeName:
-                    return place
-        return None
-
-
-    def getCurrentPlaceAndDestinationRoute(self, placeName, dest, routes):
-        if not self.hasPlace(placeName):
-            return None
-
-        # Find route with destination
-        destination_route = next((route for route in routes if route.to_route == dest), None)
-        if destination_route:
-            # Check if the current route has the place and destination route exists
-            return destination_route if destination_route.hasPlace(placeName) else None
-        return None
-
-    def getCurrentPlaceAndDestinationRouteTimes(self, placeName, dest, routes):
-        route = self.getCurrentPlaceAndDestinationRoute(placeName, dest, routes)
-        if route:
-            return route.getPlaceTimes(placeName)
-        return []
-
-
-class ScheduleService:
-    def __init__(self):
-        self.base_url = "https://scrapper-rsro.onrender.com"
-        self.pdf_service = PDFService()
-        self.place_service = PlaceMapService()
-
-    # Function to clean up the route data from the file name
-    def clean_route_data(self, file_name):
-        match = re.match(r"([^_]+(?:_[^_]+)*)___([^_]+(?:_[^_]+)*)_from_(\d+)_to_(\d+)_([\d]+)\.pdf", file_name)
-        if match:
-            from_route = match.group(1).replace('_', ' ').title()
-            to_route = match.group(2).replace('_', ' ').title()
-            effective_date = match.group(3)
-            time_table_no = match.group(5)
-            print('clean data available')
-            return Route(from_route, to_route, file_name, effective_date, time_table_no)
-        # print(file_name)
-        return None
-
-    # Function to fetch the list of files
-    def get_files_list(self):
-        response = self.pdf_service.list_downloaded_pdfs()
-        if response:
-            return {'files': response}
-        return []
-    
-    # # Function to fetch the list of files
-    # def get_files_list_onsite(self):
-    #     response = self.pdf_service.fetch_pdf_links_with_param()
-    #     if response:
-    #         return {'files': response}
-    #     return []
-
-    # Function to extract route data from the PDF file
-    def extract_route_data(self, pdf_name):
-        # print('extracting route data')
-        places = self.place_service.extract_text_from_pdf(pdf_name)
-        return {'places': places, 'placesMap': self.place_service.places_map}
-
-    # Function to get the routes, process file data, and extract additional details using threading
-    def get_routes(self):
-        files = self.get_files_list()['files']
-        routes = []
-        extracted_data_list = []
-
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_route = {}
-
-            for file in files:
-                route = self.clean_route_data(file)
-                if route:
-                    # Submit the extraction task to the thread pool
-                    future = executor.submit(self.extract_route_data, route.pdf)
-                    future_to_route[future] = route
-                    routes.append(route)
-
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_route):
-                route = future_to_route[future]
-                try:
-                    extracted_data = future.result()
-                    if extracted_data:
-                        route.add_places(extracted_data['places'])
-                        route.add_places_map(extracted_data['placesMap'])
-                except Exception as e:
-                    print(f"Error processing {route.pdf}: {e}")
-
-        print(f'found {len(routes)} routes')
-        return routes
-    
-    # Method to find times for user location and destination
-    def find_times_for_location_and_destination(self, user_location, dest):
-        routes = self.get_routes()
-        times = []
-
-        # Loop through all routes and fetch times for the user location and destination
-        for route in routes:
-            # Check if the current route has the user location and destination
-            if route.hasPlace(user_location) and route.hasPlace(dest):
-                print(f'route: {route}')
-                # Get times for the user location
-                place_data = route.getPlaceDetails(user_location)
-                if place_data == None:
-                    continue
-                
-                times_for_user = place_data.get('times')
-                prev_location = place_data.get('prev')
-                
-                if times_for_user:
-                    bus_details = f"Bus {route.getRouteName()} will arrive in {user_location} at: {', '.join(times_for_user)}"
-                    timeObject = {'times': times_for_user, 'user_location':user_location, 'destination': dest,'bus_route': route.getRouteName(), 'details':bus_details, 'prev':prev_location}
-                    times.append(timeObject)
-
-        # Output the times found
-        if times:
-            return times
-        else:
-            response = f"No schedule found for {user_location} to {dest}."
-            print(response)
-            return response
-
-    def clean_places(self, places):
-        invalid_patterns = [
-            r"^.*\b(STANDARD|SATURDAYS|SUNDAYS|OPERATED|REG|CONDITIONS|CARRIAGE|WEBSITE|LIABLE|ANY|LOSS|INCONVENIENCE|FAILURE|MAINTAIN|VEHICLES|TIMETABLE).*", # Regex for common invalid phrases
-            r"^[A-Za-z]+\.[A-Za-z]+$",  # Abbreviations like A.D.E.
-            r"^[A-Za-z]+\s*[A-Za-z]+$", # Single word place names (Optional if you want to keep these)
-            r"\(",  # If you want to remove places with parenthesis (like "MAMRE (PARADISE RD)")
-            r"^\s*$",  # Remove empty strings
-        ]
-
-        valid_places = []
-        
-        for place in places:
-            is_valid = True
-            for pattern in invalid_patterns:
-                if re.match(pattern, place):
-                    is_valid = False
-                    break
-            
-            if is_valid:
-                valid_places.append(place)
-
-        return valid_places
-
-    # Method to get all available places
-    def get_all_places(self):
-        all_places = set()  # Using a set to avoid duplicates
-        routes = self.get_routes()  #  method to fetch routes
-
-        for route in routes:
-            all_places.update(route.places)  # Add places from each route
-
-        return sorted(all_places)
-    
-     # Method to get all available places
-    def get_all_placesMap(self):
-        all_places = []  # Using a set to avoid duplicates
-        routes = self.get_routes()  #  method to fetch routes
-        
-        for route in routes:
-            print(route)
-            print(route.pdf)
-            # # print('\n')
-            print(route.places)
-            # print(route)
-            print('\n')
-
-            all_places.extend(route.places_map)  # Add places from each route
-
-        return all_places
-    
-
-    
-
-# # Example usage:
-
-# userlocation = "DU NOON"
-# dest = "MAMRE (PARADISE RD)"
-
-# # Example usage:
-# schedule_service = ScheduleService()
-
-# schedule_service.get_all_placesMap()
-
-# # Call the method with user location and destination
+import re
+import os
+import sys
+import hashlib
+import logging
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from flask import jsonify
+from pdf_service import PDFService, PlaceMapService
+import concurrent.futures
+from ingestion_report import (
+    FILENAME_FORMAT, STATUS_FAILED, STATUS_OVER_BUDGET, STATUS_QUARANTINED, STATUS_REJECTED,
+    IngestionReport, Quarantine, file_fingerprint,
+)
+from metrics import timed
+from response_cache import ResultCache
+from row_classifier import row_classifier
+from stop_catalog import StopCatalog
+from stop_times import StopTimesTable
+from timetable_time import SAST, DAY_MASK_BITS, DayType, TimetableTime, clock_to_minutes, day_mask_for, legacy_string
+
+# How long a built index is trusted before the PDF folder is re-scanned for changes
+INDEX_RECHECK_SECONDS = float(os.getenv('INDEX_RECHECK_SECONDS', '5'))
+GTFS_PATH = os.getenv('GTFS_PATH', os.path.join('data', 'gtfs'))
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', os.path.join('data', 'snapshot'))
+
+# Memoized /schedules results; a handful of popular pairs make up most traffic
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv('RESULT_CACHE_TTL_SECONDS', '300'))
+
+logger = logging.getLogger(__name__)
+
+
+# A gtfs or snapshot source that is not on disk would fail every request, so it is checked
+# once at startup and the index falls back to parsing the PDFs
+def check_index_source(source):
+    if source == 'gtfs':
+        from gtfs_service import missing_tables
+        path, missing = GTFS_PATH, missing_tables(GTFS_PATH)
+    elif source == 'snapshot':
+        from snapshot_service import missing_datasets, require_pyarrow
+        try:
+            require_pyarrow()
+        except RuntimeError as e:
+            logger.error("INDEX_SOURCE=snapshot is unusable (%s); building the index from PDFs instead", e)
+            return 'pdf'
+        path, missing = SNAPSHOT_PATH, missing_datasets(SNAPSHOT_PATH)
+    elif source == 'pdf':
+        return source
+    else:
+        logger.error("Unknown INDEX_SOURCE=%s; building the index from PDFs instead", source)
+        return 'pdf'
+    if missing:
+        logger.error("INDEX_SOURCE=%s but %s has no %s; building the index from PDFs instead",
+                     source, path, ', '.join(missing))
+        return 'pdf'
+    return source
+
+
+# What the index is built from: 'pdf' parses pdf_downloads, 'gtfs' loads the feed at
+# GTFS_PATH, 'snapshot' loads the Parquet/Arrow snapshot at SNAPSHOT_PATH
+INDEX_SOURCE = check_index_source(os.getenv('INDEX_SOURCE', 'pdf'))
+
+# Fields a parsed place dict carries, all readable from a StopRecord
+PLACE_FIELDS = ('name', 'times', 'encoded_times', 'next', 'prev')
+DAY_MASK = int(DayType.ANY)
+
+
+def intern_or_none(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# One stop on one route. Departures are two parallel arrays: minutes after midnight
+# and a packed word holding the DayType mask (low bits) and the footnote bits
+class StopRecord:
+    __slots__ = ('name', 'minutes', 'flags', 'next', 'prev')
+
+    def __init__(self, name, encoded_times=(), next=None, prev=None):
+        self.name = sys.intern(name)
+        self.minutes = array('H', [encoded.minutes for encoded in encoded_times])
+        flags = [encoded.day_mask | encoded.footnotes << DAY_MASK_BITS for encoded in encoded_times]
+        self.flags = array('H' if max(flags, default=0) <= 0xFFFF else 'L', flags)
+        self.next = intern_or_none(next)
+        self.prev = intern_or_none(prev)
+
+    @classmethod
+    def from_place(cls, place):
+        return cls(place['name'], place.get('encoded_times', ()), place.get('next'), place.get('prev'))
+
+    # Adopts already-packed minute and flag arrays, e.g. slices of a loaded snapshot
+    @classmethod
+    def from_arrays(cls, name, minutes, flags, next=None, prev=None):
+        record = cls(name, (), next, prev)
+        record.minutes = minutes
+        record.flags = flags
+        return record
+
+    @property
+    def encoded_times(self):
+        return [TimetableTime(minutes, flags & DAY_MASK, flags >> DAY_MASK_BITS) for minutes, flags in zip(self.minutes, self.flags)]
+
+    @property
+    def times(self):
+        return [legacy_string(encoded) for encoded in self.encoded_times]
+
+    # Read-only dict-style access, so callers written against the place dicts keep working
+    def get(self, key, default=None):
+        if key in PLACE_FIELDS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key not in PLACE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in PLACE_FIELDS}
+
+
+class Route:
+    __slots__ = ('from_route', 'to_route', 'pdf', 'effective_date', 'time_table_no', 'places', 'stops')
+
+    def __init__(self, from_route, to_route, pdf, effective_date, time_table_no):
+        self.from_route = sys.intern(from_route)
+        self.to_route = sys.intern(to_route)
+        self.pdf = pdf
+        self.effective_date = effective_date
+        self.time_table_no = time_table_no
+        self.places = ()
+        self.stops = {}  # stop name -> StopRecord
+
+    def __str__(self):
+        return f"Route({self.from_route} <-> {self.to_route}, Effective Date: {self.effective_date}, Time Table No: {self.time_table_no})"
+
+    def add_places(self, places):
+        self.places = tuple(sys.intern(place) for place in places)
+
+    # Compacts the parser's place dicts into StopRecords; the first entry for a name wins
+    def add_places_map(self, places_map):
+        stops = {}
+        for place in places_map:
+            if place['name'] not in stops:
+                record = StopRecord.from_place(place)
+                stops[record.name] = record
+        self.stops = stops
+
+    @property
+    def places_map(self):
+        return [record.to_dict() for record in self.stops.values()]
+
+    def getRouteName(self):
+        return f"{self.from_route} <-> {self.to_route}"
+
+    def hasPlace(self, placeName):
+        return placeName.upper() in self.stops
+
+    def getPlaceTimes(self, placeName):
+        place = self.getPlaceDetails(placeName)
+        return place.times if place else []
+
+    def getPlaceDetails(self, placeName):
+        return self.stops.get(placeName.upper())
+
+    def getCurrentPlaceAndDestinationRoute(self, placeName, dest, routes):
+        if not self.hasPlace(placeName):
+            return None
+
+        # Find route with destination
+        destination_route = next((route for route in routes if route.to_route == dest), None)
+        if destination_route:
+            # Check if the current route has the place and destination route exists
+            return destination_route if destination_route.hasPlace(placeName) else None
+        return None
+
+    def getCurrentPlaceAndDestinationRouteTimes(self, placeName, dest, routes):
+        route = self.getCurrentPlaceAndDestinationRoute(placeName, dest, routes)
+        if route:
+            return route.getPlaceTimes(placeName)
+        return []
+
+
+# Parsed timetable shared by every ScheduleService instance until the PDFs change
+class TimetableIndex:
+    def __init__(self, routes, version):
+        self.routes = routes
+        self.version = version
+        self.built_at = datetime.now(timezone.utc)
+        self.stop_times_table = None
+        self.lock = threading.Lock()
+        self.catalog = StopCatalog.from_routes(routes)
+        # Posting lists: canonical stop id -> routes serving any spelling of it, in route order
+        self.place_routes = {}
+        # (stop id, id(route)) -> the spelling that route's timetable uses for the stop
+        self.route_spellings = {}
+        for route in routes:
+            for place in route.places:
+                stop_id = self.catalog.resolve(place)
+                key = (stop_id, id(route))
+                if stop_id is not None and key not in self.route_spellings:
+                    self.route_spellings[key] = place
+                    self.place_routes.setdefault(stop_id, []).append(route)
+
+    def routes_for(self, place_name):
+        return self.place_routes.get(self.catalog.resolve(place_name), [])
+
+    # A route's record for a stop under whichever spelling the caller used
+    def place_details(self, route, place_name):
+        spelling = self.route_spellings.get((self.catalog.resolve(place_name), id(route)))
+        return route.getPlaceDetails(spelling) if spelling else None
+
+    # Columnar departures table, built on first use and then shared like the index itself
+    def stop_times(self):
+        if self.stop_times_table is None:
+            with self.lock:
+                if self.stop_times_table is None:
+                    self.stop_times_table = StopTimesTable(self.routes, self.catalog)
+        return self.stop_times_table
+
+
+class ScheduleService:
+    _index = None
+    _index_lock = threading.Lock()
+    _index_checked_at = 0.0
+    # Shared like the index, and emptied whenever the index version changes
+    _pair_results = ResultCache('find_times', RESULT_CACHE_SIZE, RESULT_CACHE_TTL_SECONDS)
+    _ingestion_report = None
+    _quarantine = Quarantine()
+
+    def __init__(self):
+        self.base_url = "https://scrapper-rsro.onrender.com"
+        self.pdf_service = PDFService()
+        self.place_service = PlaceMapService()
+
+    # Function to clean up the route data from the file name
+    def clean_route_data(self, file_name):
+        match = re.match(r"([^_]+(?:_[^_]+)*)___([^_]+(?:_[^_]+)*)_from_(\d+)_to_(\d+)_([\d]+)\.pdf", file_name)
+        if match:
+            from_route = match.group(1).replace('_', ' ').title()
+            to_route = match.group(2).replace('_', ' ').title()
+            effective_date = match.group(3)
+            time_table_no = match.group(5)
+            logger.debug('clean data available for %s', file_name)
+            return Route(from_route, to_route, file_name, effective_date, time_table_no)
+        # print(file_name)
+        return None
+
+    # Function to fetch the list of files
+    def get_files_list(self):
+        response = self.pdf_service.list_downloaded_pdfs()
+        if response:
+            return {'files': response}
+        return []
+    
+    # # Function to fetch the list of files
+    # def get_files_list_onsite(self):
+    #     response = self.pdf_service.fetch_pdf_links_with_param()
+    #     if response:
+    #         return {'files': response}
+    #     return []
+
+    # Function to extract route data from the PDF file
+    def extract_route_data(self, pdf_name):
+        # print('extracting route data')
+        # A fresh PlaceMapService per file keeps each route's places_map to its own PDF
+        place_service = PlaceMapService()
+        places = place_service.extract_text_from_pdf(pdf_name)
+        return {'places': places, 'placesMap': place_service.places_map}
+
+    # Signature of the timetable folder; changes whenever a PDF is added, removed or replaced
+    @timed('index.version_check')
+    def get_index_version(self):
+        return self.quarantine_version(self.get_source_version())
+
+    def get_source_version(self):
+        if INDEX_SOURCE == 'gtfs':
+            from gtfs_service import feed_version
+            return feed_version(GTFS_PATH)
+        if INDEX_SOURCE == 'snapshot':
+            from snapshot_service import snapshot_version
+            return snapshot_version(SNAPSHOT_PATH)
+        entries = []
+        for file in sorted(self.pdf_service.list_downloaded_pdfs()):
+            stat = os.stat(os.path.join(self.pdf_service.download_folder, file))
+            entries.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.sha1('\n'.join(entries).encode()).hexdigest()[:16]
+
+    # Quarantining or releasing a file changes what a PDF build holds without touching the
+    # folder, so the quarantine is part of the version every version-keyed cache checks
+    def quarantine_version(self, source_version):
+        if INDEX_SOURCE != 'pdf':
+            return source_version
+        return f"{source_version}-{ScheduleService._quarantine.version()}"
+
+    # Returns the shared index, rebuilding it only when the PDFs on disk or the quarantine have changed
+    def get_index(self, recheck=False):
+        index = ScheduleService._index
+        if index is not None and not recheck and time.monotonic() - ScheduleService._index_checked_at < INDEX_RECHECK_SECONDS:
+            return index
+        source_version = self.get_source_version()
+        version = self.quarantine_version(source_version)
+        ScheduleService._index_checked_at = time.monotonic()
+        if index is None or index.version != version:
+            with ScheduleService._index_lock:
+                index = ScheduleService._index
+                if index is None or index.version != version:
+                    index = self.build_index(source_version)
+                    ScheduleService._index = index
+        return index
+
+    # The quarantine is read after loading: the build itself quarantines the files it drops
+    def build_index(self, source_version):
+        routes = self.load_routes()
+        return TimetableIndex(routes, self.quarantine_version(source_version))
+
+    def get_routes(self):
+        return self.get_index().routes
+
+    def load_routes(self):
+        if INDEX_SOURCE == 'gtfs':
+            from gtfs_service import load_gtfs
+            return load_gtfs(GTFS_PATH)
+        if INDEX_SOURCE == 'snapshot':
+            from snapshot_service import load_snapshot
+            return load_snapshot(SNAPSHOT_PATH)
+        return self.build_routes()
+
+    # Parses every timetable on a thread pool. Each file gets an entry in the ingestion
+    # report; files that fail or outrun the time budget are quarantined and left out
+    @timed('ingest.build_routes')
+    def build_routes(self):
+        report = IngestionReport()
+        quarantine = ScheduleService._quarantine
+        files = self.get_files_list()
+        files = files['files'] if files else []
+        routes = []
+
+        started_at = {}
+
+        # Timed inside the worker, so queueing behind other files does not count against the budget
+        def parse(route):
+            started_at[route.pdf] = time.monotonic()
+            extracted = self.extract_route_data(route.pdf)
+            return extracted, time.monotonic() - started_at[route.pdf]
+
+        fingerprints = {}
+        future_to_route = {}
+        executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='ingest')
+        for file in files:
+            route = self.clean_route_data(file)
+            if route is None:
+                report.record(file, STATUS_REJECTED, error=f"file name does not match {FILENAME_FORMAT}")
+                continue
+            fingerprints[file] = file_fingerprint(os.path.join(self.pdf_service.download_folder, file))
+            held = quarantine.holds(file, fingerprints[file])
+            if held:
+                report.record(file, STATUS_QUARANTINED, error=held['reason'])
+                continue
+            # Submit the extraction task to the thread pool
+            future_to_route[executor.submit(parse, route)] = route
+            routes.append(route)
+
+        dropped = set()
+        pending = set(future_to_route)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=1, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                route = future_to_route[future]
+                try:
+                    extracted_data, parse_seconds = future.result()
+                except Exception as e:
+                    parse_seconds = time.monotonic() - started_at.get(route.pdf, time.monotonic())
+                    report.record(route.pdf, STATUS_FAILED, parse_seconds, error=f"{type(e).__name__}: {e}")
+                    quarantine.add(route.pdf, fingerprints[route.pdf], STATUS_FAILED, str(e))
+                    dropped.add(route.pdf)
+                    continue
+                if parse_seconds > report.budget_seconds:
+                    reason = f"parse took {parse_seconds:.1f} s, budget is {report.budget_seconds:.0f} s"
+                    report.record(route.pdf, STATUS_OVER_BUDGET, parse_seconds, error=reason)
+                    quarantine.add(route.pdf, fingerprints[route.pdf], STATUS_OVER_BUDGET, reason)
+                    dropped.add(route.pdf)
+                    continue
+                if extracted_data:
+                    route.add_places(extracted_data['places'])
+                    route.add_places_map(extracted_data['placesMap'])
+                report.record_route(route, parse_seconds)
+
+            # A parse that is still running past its budget is abandoned; its thread is left
+            # to finish in the background rather than holding up the index
+            now = time.monotonic()
+            for future in list(pending):
+                route = future_to_route[future]
+                if route.pdf in started_at and now - started_at[route.pdf] > report.budget_seconds:
+                    pending.discard(future)
+                    reason = f"parse still running after {report.budget_seconds:.0f} s"
+                    report.record(route.pdf, STATUS_OVER_BUDGET, now - started_at[route.pdf], error=reason)
+                    quarantine.add(route.pdf, fingerprints[route.pdf], STATUS_OVER_BUDGET, reason)
+                    dropped.add(route.pdf)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        routes = [route for route in routes if route.pdf not in dropped]
+        ScheduleService._ingestion_report = report.finish()
+        logger.info('found %d routes (%s)', len(routes), ', '.join(f"{count} {status}" for status, count in sorted(report.summary().items())))
+        return routes
+
+    # Report of the last PDF build, or None when the index came from GTFS or a snapshot
+    def get_ingestion_report(self):
+        self.get_index()
+        report = ScheduleService._ingestion_report
+        return report.to_dict() if report else None
+
+    # Lets a fixed file back in and rebuilds the index without waiting for the next recheck
+    def release_quarantined(self, file_name):
+        if not ScheduleService._quarantine.release(file_name):
+            return False
+        self.get_index(recheck=True)
+        return True
+
+    # Method to find times for user location and destination
+    @timed('index.find_times')
+    def find_times_for_location_and_destination(self, user_location, dest):
+        index = self.get_index()
+        # Keyed on the caller's spelling rather than the canonical stops because the
+        # entries echo it back ('user_location', 'details')
+        return ScheduleService._pair_results.get(
+            (user_location, dest), index.version,
+            lambda: self.compute_times_for_location_and_destination(index, user_location, dest),
+        )
+
+    def compute_times_for_location_and_destination(self, index, user_location, dest):
+        times = []
+
+        # Only routes on both stops' posting lists can serve the pair
+        dest_routes = {id(route) for route in index.routes_for(dest)}
+        for route in index.routes_for(user_location):
+            if id(route) in dest_routes:
+                logger.debug('route: %s', route)
+                time_entry = self.build_time_entry(index, route, user_location, dest)
+                if time_entry:
+                    times.append(time_entry)
+
+        # Output the times found
+        if times:
+            return times
+        else:
+            response = f"No schedule found for {user_location} to {dest}."
+            logger.debug(response)
+            return response
+
+    # Times at the user's stop on one route, in the shape /schedules returns
+    def build_time_entry(self, index, route, user_location, dest, after_minutes=None):
+        # Get times for the user location
+        place_data = index.place_details(route, user_location)
+        if place_data == None:
+            return None
+
+        times_for_user = place_data.get('times')
+        prev_location = place_data.get('prev')
+        if times_for_user and after_minutes is not None:
+            times_for_user = [
+                encoded.legacy() for encoded in place_data.get('encoded_times', [])
+                if encoded.minutes >= after_minutes
+            ]
+
+        if times_for_user:
+            bus_details = f"Bus {route.getRouteName()} will arrive in {user_location} at: {', '.join(times_for_user)}"
+            return {'times': times_for_user, 'user_location':user_location, 'destination': dest,'bus_route': route.getRouteName(), 'details':bus_details, 'prev':prev_location}
+        return None
+
+    # Resolves many (user_location, destination, optional time) queries against one
+    # index snapshot; posting lists and pair intersections are shared across queries
+    @timed('index.find_times_batch')
+    def find_times_batch(self, queries):
+        index = self.get_index()
+        postings = {}
+        pair_routes = {}
+        results = {}
+
+        def routes_for(place_name):
+            key = index.catalog.resolve(place_name)
+            if key not in postings:
+                postings[key] = index.place_routes.get(key, [])
+            return postings[key]
+
+        for position, query in enumerate(queries):
+            if not isinstance(query, dict):
+                results[str(position)] = {"error": "Each query must be an object"}
+                continue
+            query_id = str(query.get('id', position))
+            if query_id in results:
+                # A repeated id keeps its first result; the later query is reported under its position
+                results[f"{query_id}#{position}"] = {"error": f"Duplicate query id {query_id}"}
+                continue
+            user_location = query.get('user_location')
+            dest = query.get('destination')
+            if not user_location or not dest:
+                results[query_id] = {"error": "Missing user_location or destination"}
+                continue
+            if not isinstance(user_location, str) or not isinstance(dest, str):
+                results[query_id] = {"error": "user_location and destination must be strings"}
+                continue
+
+            after_minutes = None
+            if query.get('time'):
+                after_minutes = clock_to_minutes(query['time'])
+                if after_minutes is None:
+                    results[query_id] = {"error": f"Invalid time {query['time']}, expected HH:MM between 00:00 and 23:59"}
+                    continue
+
+            pair = (index.catalog.resolve(user_location), index.catalog.resolve(dest))
+            if pair not in pair_routes:
+                dest_routes = {id(route) for route in routes_for(dest)}
+                pair_routes[pair] = [route for route in routes_for(user_location) if id(route) in dest_routes]
+
+            times = []
+            for route in pair_routes[pair]:
+                time_entry = self.build_time_entry(index, route, user_location, dest, after_minutes)
+                if time_entry:
+                    times.append(time_entry)
+
+            if times:
+                results[query_id] = {"times": times}
+            else:
+                results[query_id] = {"message": f"No schedule found for {user_location} to {dest}."}
+
+        return {"index_version": index.version, "results": results}
+
+    # Upcoming departures from a stop for the day type of `now`, soonest first
+    @timed('index.next_departures')
+    def get_next_departures(self, place_name, now=None, limit=3):
+        now = now or datetime.now(SAST)
+        today = day_mask_for(now)
+        now_minutes = now.hour * 60 + now.minute
+        departures = []
+
+        index = self.get_index()
+        for route in index.routes_for(place_name):
+            place_data = index.place_details(route, place_name)
+            if not place_data:
+                continue
+            for encoded in place_data.get('encoded_times', []):
+                if encoded.day_mask & today and encoded.minutes >= now_minutes:
+                    departures.append({
+                        'time': encoded.clock,
+                        'minutes': encoded.minutes,
+                        'footnote': encoded.footnote_letters or None,
+                        'bus_route': route.getRouteName(),
+                        'pdf': route.pdf,
+                        'next': place_data.get('next'),
+                    })
+
+        departures.sort(key=lambda departure: departure['minutes'])
+        return departures[:limit]
+
+    # Every departure from a stop in a time window on one day type, with per-route and
+    # per-hour counts; answered from the columnar table rather than the route objects
+    @timed('index.departures_board')
+    def get_departures_board(self, place_name, day_mask, start_minutes, end_minutes, limit=50):
+        index = self.get_index()
+        board = index.stop_times().departures(place_name, start_minutes, end_minutes, day_mask, limit)
+        if board is not None:
+            stop = index.catalog.get(place_name)
+            board['stop_id'] = stop.stop_id
+            board['stop_name'] = stop.name
+            board['index_version'] = index.version
+        return board
+
+    # Typeahead over canonical stop names and their aliases, most-served stops first
+    @timed('index.suggest_stops')
+    def suggest_stops(self, query, limit=10):
+        index = self.get_index()
+        suggestions = [
+            {**stop.to_dict(), 'match': match}
+            for stop, match in index.catalog.suggest(query, limit)
+        ]
+        return {'index_version': index.version, 'suggestions': suggestions}
+
+    def clean_places(self, places):
+        return [place for place in places if row_classifier.is_valid_place(place)]
+
+    # Catalog of the timetables behind the index, one entry per route PDF
+    def get_all_routes(self):
+        return [
+            {
+                'route': route.getRouteName(),
+                'from': route.from_route,
+                'to': route.to_route,
+                'pdf': route.pdf,
+                'effective_date': route.effective_date,
+                'time_table_no': route.time_table_no,
+            }
+            for route in sorted(self.get_routes(), key=lambda route: route.pdf)
+        ]
+
+    # Method to get all available places
+    @timed('index.all_places')
+    def get_all_places(self):
+        all_places = set()  # Using a set to avoid duplicates
+        routes = self.get_routes()  #  method to fetch routes
+
+        for route in routes:
+            all_places.update(route.places)  # Add places from each route
+
+        return sorted(all_places)
+    
+     # Method to get all available places
+    def get_all_placesMap(self):
+        all_places = []  # Using a set to avoid duplicates
+        routes = self.get_routes()  #  method to fetch routes
+        
+        for route in routes:
+            logger.debug('%s %s %s', route, route.pdf, route.places)
+
+            all_places.extend(route.places_map)  # Add places from each route
+
+        return all_places
+    
+
+    
+
+# # Example usage:
+
+# userlocation = "DU NOON"
+# dest = "MAMRE (PARADISE RD)"
+
+# # Example usage:
+# schedule_service = ScheduleService()
+
+# schedule_service.get_all_placesMap()
+
+# # Call the method with user location and destination
 # schedule_service.find_times_for_location_and_destination(userlocation, dest)
\ No newline at end of file
@@ -0,0 +1,288 @@
+"""Columnar snapshots of the parsed timetables, for analytics and fast cold starts.
+
+Usage: python snapshot_service.py export [folder] [--format parquet|arrow]
+       python snapshot_service.py import [folder]
+
+A snapshot is two hive-partitioned datasets under one folder, both split by
+operator and effective date:
+
+  stop_times/operator=GABS/effective_date=20250714/part-0.parquet
+      one row per departure: route_id, stop_sequence, stop_name, minutes,
+      day_mask, footnotes
+  route_stops/operator=GABS/effective_date=20250714/part-0.parquet
+      one row per stop of a route, timed or not, with the route's metadata and
+      the stop's prev/next
+
+'arrow' writes uncompressed Arrow IPC files instead, which load memory-mapped
+without decoding. pyarrow is optional; without it this module cannot be used but
+nothing else is affected.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from array import array
+import numpy as np
+from gtfs_service import AGENCY
+from metrics import timed
+from timetable_time import DAY_MASK_BITS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+except ImportError:  # snapshots are optional; the PDF and GTFS sources need no pyarrow
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = os.path.join('data', 'snapshot')
+SNAPSHOT_FORMATS = {'parquet': 'parquet', 'arrow': 'ipc'}
+OPERATOR = AGENCY['agency_id']
+# array('L') is 8 bytes on most 64-bit platforms, so wide flags need a matching dtype
+WIDE_FLAGS_DTYPE = np.dtype(f"u{array('L').itemsize}")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Timetable snapshots need pyarrow: pip install pyarrow")
+
+
+def partition_schema():
+    return pa.schema([('operator', pa.string()), ('effective_date', pa.string())])
+
+
+def stop_times_table(routes):
+    route_ids, sequences, names, minutes, flags, dates = [], [], [], [], [], []
+    for route in routes:
+        route_id = os.path.splitext(route.pdf)[0]
+        seen = set()
+        # Numbered by position in route.places, the same stop_sequence route_stops uses
+        for sequence, name in enumerate(route.places):
+            record = route.stops.get(name)
+            count = len(record.minutes) if record is not None and name not in seen else 0
+            seen.add(name)
+            if not count:
+                continue
+            route_ids.append(pa.array([route_id] * count, pa.string()))
+            sequences.append(np.full(count, sequence, dtype=np.uint16))
+            names.append(pa.array([name] * count, pa.string()))
+            minutes.append(np.frombuffer(record.minutes, dtype=np.uint16))
+            flags.append(np.asarray(record.flags, dtype=np.uint32))
+            dates.append(pa.array([route.effective_date] * count, pa.string()))
+
+    flag = np.concatenate(flags) if flags else np.zeros(0, dtype=np.uint32)
+    total = len(flag)
+    return pa.table({
+        # Plain strings: an Arrow dictionary would be written whole into every partition file,
+        # while Parquet builds a per-file dictionary itself
+        'route_id': pa.chunked_array(route_ids, pa.string()),
+        'stop_sequence': np.concatenate(sequences) if sequences else np.zeros(0, dtype=np.uint16),
+        'stop_name': pa.chunked_array(names, pa.string()),
+        'minutes': np.concatenate(minutes) if minutes else np.zeros(0, dtype=np.uint16),
+        'day_mask': (flag & ((1 << DAY_MASK_BITS) - 1)).astype(np.uint8),
+        'footnotes': flag >> DAY_MASK_BITS,
+        'operator': pa.array([OPERATOR] * total, pa.string()),
+        'effective_date': pa.chunked_array(dates, pa.string()),
+    })
+
+
+def route_stops_table(routes):
+    columns = {name: [] for name in (
+        'route_index', 'route_id', 'from_route', 'to_route', 'pdf', 'time_table_no',
+        'stop_sequence', 'stop_name', 'prev', 'next', 'operator', 'effective_date',
+    )}
+    for route_index, route in enumerate(routes):
+        # A route without stops still gets a row, so the route list survives the round trip
+        stops = list(enumerate(route.places)) or [(None, None)]
+        for sequence, name in stops:
+            record = route.stops.get(name) if name is not None else None
+            columns['route_index'].append(route_index)
+            columns['route_id'].append(os.path.splitext(route.pdf)[0])
+            columns['from_route'].append(route.from_route)
+            columns['to_route'].append(route.to_route)
+            columns['pdf'].append(route.pdf)
+            columns['time_table_no'].append(route.time_table_no)
+            columns['stop_sequence'].append(sequence)
+            columns['stop_name'].append(name)
+            columns['prev'].append(record.prev if record else None)
+            columns['next'].append(record.next if record else None)
+            columns['operator'].append(OPERATOR)
+            columns['effective_date'].append(route.effective_date)
+    types = {'route_index': pa.uint32(), 'stop_sequence': pa.uint16()}
+    return pa.table({name: pa.array(values, types.get(name, pa.string())) for name, values in columns.items()})
+
+
+def write_dataset(table, folder, file_format):
+    # One chunk per route stop would otherwise become one tiny row group each
+    ds.write_dataset(
+        table.combine_chunks(), folder,
+        format=SNAPSHOT_FORMATS[file_format],
+        partitioning=ds.partitioning(partition_schema(), flavor='hive'),
+        basename_template=f"part-{{i}}.{file_format}",
+    )
+
+
+# Swaps a freshly written snapshot in whole, so partitions of effective dates that are
+# no longer exported do not linger next to it
+def replace_folder(staging, folder):
+    retired = None
+    if os.path.exists(folder):
+        retired = f"{staging}-old"
+        os.rename(folder, retired)
+    os.rename(staging, folder)
+    if retired:
+        shutil.rmtree(retired)
+
+
+@timed('snapshot.export')
+def export_snapshot(routes, folder=DEFAULT_SNAPSHOT_PATH, file_format='parquet'):
+    """Writes the routes as a snapshot and returns the row count of each dataset."""
+    require_pyarrow()
+    if file_format not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unknown snapshot format {file_format}, expected one of {sorted(SNAPSHOT_FORMATS)}")
+    stop_times = stop_times_table(routes)
+    route_stops = route_stops_table(routes)
+    parent = os.path.dirname(os.path.abspath(folder))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.snapshot-', dir=parent)
+    try:
+        write_dataset(stop_times, os.path.join(staging, 'stop_times'), file_format)
+        write_dataset(route_stops, os.path.join(staging, 'route_stops'), file_format)
+        replace_folder(staging, folder)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    logger.info("exported %d routes to %s (%s)", len(routes), folder, file_format)
+    return {'stop_times': stop_times.num_rows, 'route_stops': route_stops.num_rows}
+
+
+def snapshot_files(folder):
+    for root, _, files in os.walk(folder):
+        for name in files:
+            yield os.path.join(root, name)
+
+
+def snapshot_format(folder):
+    for path in snapshot_files(folder):
+        if path.endswith('.arrow'):
+            return 'arrow'
+    return 'parquet'
+
+
+def missing_datasets(folder=DEFAULT_SNAPSHOT_PATH):
+    """Datasets load_snapshot needs that the snapshot at folder lacks."""
+    return [name for name in ('route_stops', 'stop_times') if not any(snapshot_files(os.path.join(folder, name)))]
+
+
+def snapshot_version(folder=DEFAULT_SNAPSHOT_PATH):
+    """Signature of a snapshot on disk, in the same spirit as ScheduleService.get_index_version."""
+    entries = []
+    for path in sorted(snapshot_files(folder)):
+        stat = os.stat(path)
+        entries.append(f"{os.path.relpath(path, folder)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return 'snap-' + hashlib.sha1('\n'.join(entries).encode()).hexdigest()[:11]
+
+
+def read_dataset(folder, file_format):
+    # Arrow IPC files are memory-mapped, so their columns are views of the page cache
+    dataset = ds.dataset(
+        folder, format=SNAPSHOT_FORMATS[file_format],
+        partitioning=ds.partitioning(partition_schema(), flavor='hive'),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+    return dataset.to_table()
+
+
+def column_numpy(table, name, dtype):
+    return table[name].combine_chunks().to_numpy(zero_copy_only=False).astype(dtype, copy=False)
+
+
+@timed('snapshot.import')
+def load_snapshot(folder=DEFAULT_SNAPSHOT_PATH):
+    """Rebuilds Route objects from a snapshot without touching the PDFs."""
+    require_pyarrow()
+    from schedule_service import Route, StopRecord
+
+    file_format = snapshot_format(folder)
+    route_stops = read_dataset(os.path.join(folder, 'route_stops'), file_format).to_pydict()
+    stop_times = read_dataset(os.path.join(folder, 'stop_times'), file_format)
+    stop_times = stop_times.sort_by([
+        ('route_id', 'ascending'), ('stop_sequence', 'ascending'),
+        ('minutes', 'ascending'), ('day_mask', 'ascending'), ('footnotes', 'ascending'),
+    ])
+
+    # Each (route, stop) is one contiguous run of the sorted table; slice the columns by run
+    route_keys = stop_times['route_id'].combine_chunks()
+    route_index = pc.index_in(route_keys, value_set=pc.unique(route_keys)).to_numpy(zero_copy_only=False)
+    sequence = column_numpy(stop_times, 'stop_sequence', np.uint16)
+    minutes = column_numpy(stop_times, 'minutes', np.uint16)
+    flags = column_numpy(stop_times, 'day_mask', np.uint32) | column_numpy(stop_times, 'footnotes', np.uint32) << DAY_MASK_BITS
+    starts = np.flatnonzero(np.diff(route_index, prepend=-1) | np.diff(sequence.astype(np.int32), prepend=-1)) if len(sequence) else np.zeros(0, dtype=np.int64)
+    ends = np.append(starts[1:], len(sequence))
+    run_keys = route_keys.take(pa.array(starts)).to_pylist() if len(starts) else []
+
+    runs = {}  # (route_id, stop_sequence) -> (minutes, flags) as array.array
+    for key, start, end in zip(run_keys, starts.tolist(), ends.tolist()):
+        run_flags = flags[start:end]
+        if run_flags.max() <= 0xFFFF:
+            flag_array = array('H', run_flags.astype(np.uint16).tobytes())
+        else:
+            flag_array = array('L', run_flags.astype(WIDE_FLAGS_DTYPE).tobytes())
+        runs[(key, int(sequence[start]))] = (array('H', minutes[start:end].tobytes()), flag_array)
+
+    routes = {}
+    stops = {}  # route_id -> {name: StopRecord}
+    places = {}  # route_id -> [name, ...]
+    empty = (array('H'), array('H'))
+    # Routes come back in the order they were indexed, which posting lists preserve
+    order = sorted(range(len(route_stops['route_id'])), key=lambda row: (
+        route_stops['route_index'][row], route_stops['stop_sequence'][row] or 0))
+    for row in order:
+        route_id = route_stops['route_id'][row]
+        if route_id not in routes:
+            routes[route_id] = Route(
+                route_stops['from_route'][row], route_stops['to_route'][row], route_stops['pdf'][row],
+                route_stops['effective_date'][row], route_stops['time_table_no'][row],
+            )
+            stops[route_id], places[route_id] = {}, []
+        name = route_stops['stop_name'][row]
+        if name is None:
+            continue
+        stop_minutes, stop_flags = runs.get((route_id, route_stops['stop_sequence'][row]), empty)
+        record = StopRecord.from_arrays(name, stop_minutes, stop_flags, route_stops['next'][row], route_stops['prev'][row])
+        places[route_id].append(name)
+        stops[route_id].setdefault(record.name, record)
+
+    for route_id, route in routes.items():
+        route.add_places(places[route_id])
+        route.stops = stops[route_id]
+    logger.info("loaded %d routes from %s (%s)", len(routes), folder, file_format)
+    return list(routes.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['export', 'import'])
+    parser.add_argument('path', nargs='?', default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument('--format', choices=sorted(SNAPSHOT_FORMATS), default='parquet')
+    args = parser.parse_args()
+
+    from metrics import configure_logging
+    configure_logging()
+    if args.command == 'export':
+        from schedule_service import ScheduleService
+        print(export_snapshot(ScheduleService().get_routes(), args.path, args.format))
+    else:
+        start = time.perf_counter()
+        routes = load_snapshot(args.path)
+        print({'routes': len(routes), 'stops': sum(len(route.places) for route in routes),
+               'seconds': round(time.perf_counter() - start, 3)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import bisect
+import hashlib
+import heapq
+import re
+from functools import lru_cache
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Indel
+
+# Abbreviations expanded token by token, so "KOEBERG RD" and "Koeberg Road" normalize alike
+ABBREVIATIONS = {
+    'RD': 'ROAD', 'RDS': 'ROADS', 'STR': 'STREET', 'AVE': 'AVENUE', 'DRV': 'DRIVE', 'DR': 'DRIVE',
+    'BLVD': 'BOULEVARD', 'BL': 'BOULEVARD', 'HOSP': 'HOSPITAL', 'STN': 'STATION', 'TERM': 'TERMINUS',
+    'IND': 'INDUSTRIA', 'SCH': 'SCHOOL', 'SCHLS': 'SCHOOLS', 'CNR': 'CORNER', 'VILL': 'VILLAGE',
+    'CTR': 'CENTRE', 'CENTER': 'CENTRE', 'MT': 'MOUNT', 'SAP': 'SAPS',
+}
+TOKEN_SPLIT = re.compile(r"[^A-Z0-9]+")
+# Keys this many inserted/deleted characters apart are the same stop ("ROOSENDAAL" and
+# "ROOSENDAL"); a substitution costs 2, so "KHALA" and "KHAZA" stay apart
+FUZZY_MERGE_DISTANCE = 1
+# Short names ("N2", "NY 3") differ by a character too often to be fuzzy-merged
+MIN_FUZZY_LENGTH = 6
+# Typeahead falls back to typo-tolerant matching above this rapidfuzz partial_ratio
+SUGGEST_FUZZY_SCORE = 80
+
+
+@lru_cache(maxsize=65536)
+def normalize_stop_name(name):
+    tokens = [ABBREVIATIONS.get(token, token) for token in TOKEN_SPLIT.split(name.upper()) if token]
+    if len(tokens) > 1 and tokens[0] == 'THE':
+        tokens = tokens[1:]
+    return ' '.join(tokens)
+
+
+# Spacing-insensitive form of a normalized name: "TURF HALL ROAD" == "TURFHALL ROAD"
+def compact_key(normalized):
+    return normalized.replace(' ', '')
+
+
+# Upper-cased tokens without abbreviation expansion; a half-typed "DR" must not become "DRIVE"
+def query_tokens(text):
+    return ' '.join(token for token in TOKEN_SPLIT.split(text.upper()) if token)
+
+
+# Every word-start suffix of a name, so "TOWN" finds "CAPE TOWN"
+def word_suffixes(text):
+    words = text.split(' ')
+    return [' '.join(words[start:]) for start in range(len(words))]
+
+
+def numbers_in(normalized):
+    return [token for token in normalized.split() if any(char.isdigit() for char in token)]
+
+
+class StopEntry:
+    __slots__ = ('stop_id', 'name', 'variants', 'route_count')
+
+    def __init__(self, stop_id, name, variants, route_count):
+        self.stop_id = stop_id
+        self.name = name
+        self.variants = variants
+        self.route_count = route_count
+
+    def to_dict(self):
+        return {'id': self.stop_id, 'name': self.name, 'aliases': list(self.variants), 'route_count': self.route_count}
+
+
+class StopCatalog:
+    """Clusters the stop names seen across all timetables into canonical stops.
+
+    Every spelling is normalized (case, punctuation, abbreviations, a leading "THE"),
+    spellings with the same spacing-insensitive key are merged, and remaining keys are
+    merged with rapidfuzz when one is a dropped or doubled letter away from another
+    and both carry the same numbers. Each
+    cluster gets a stable id derived from its members, and lookups are one dict probe
+    on the raw name with a normalized-key fallback.
+    """
+
+    def __init__(self, route_counts):
+        """route_counts maps each raw stop name to the number of routes it appears on."""
+        # Popular spellings first, so they seed clusters and become the display name
+        variants = sorted(route_counts, key=lambda name: (-route_counts[name], name))
+        clusters = []  # [members]
+        cluster_for_key = {}  # compact key -> cluster index
+        blocks = {}  # first 3 characters of compact key -> [compact key, ...] seeding a cluster
+
+        for name in variants:
+            normalized = normalize_stop_name(name)
+            key = compact_key(normalized)
+            if not key:
+                continue
+            cluster = cluster_for_key.get(key)
+            if cluster is None and len(key) >= MIN_FUZZY_LENGTH:
+                candidates = blocks.get(key[:3], [])
+                match = process.extractOne(key, candidates, scorer=Indel.distance, score_cutoff=FUZZY_MERGE_DISTANCE)
+                if match and numbers_in(normalized) == numbers_in(normalize_stop_name(clusters[cluster_for_key[match[0]]][0])):
+                    cluster = cluster_for_key[match[0]]
+            if cluster is None:
+                cluster = len(clusters)
+                clusters.append([])
+                blocks.setdefault(key[:3], []).append(key)
+            cluster_for_key.setdefault(key, cluster)
+            clusters[cluster].append(name)
+
+        self.stops = {}  # stop id -> StopEntry
+        self.aliases = {}  # raw upper-cased name, normalized name or compact key -> stop id
+        for members in clusters:
+            keys = sorted({compact_key(normalize_stop_name(name)) for name in members})
+            # Derived from the member keys rather than build order, so ids survive rebuilds
+            stop_id = 's' + hashlib.sha1(keys[0].encode()).hexdigest()[:10]
+            route_count = sum(route_counts[name] for name in members)
+            self.stops[stop_id] = StopEntry(stop_id, members[0], tuple(members), route_count)
+            for name in members:
+                normalized = normalize_stop_name(name)
+                self.aliases.setdefault(name.upper(), stop_id)
+                self.aliases.setdefault(normalized, stop_id)
+                self.aliases.setdefault(compact_key(normalized), stop_id)
+
+        # Typeahead index: sorted (key, stop id) over word-start suffixes of every spelling,
+        # raw and normalized, plus the compact key so "TURFHALL" finds "TURF HALL RD"
+        prefix_keys = set()
+        for entry in self.stops.values():
+            for name in entry.variants:
+                normalized = normalize_stop_name(name)
+                for key in word_suffixes(query_tokens(name)) + word_suffixes(normalized) + [compact_key(normalized)]:
+                    prefix_keys.add((key, entry.stop_id))
+        self.prefix_index = sorted(prefix_keys)
+        self.prefix_keys = [key for key, _ in self.prefix_index]
+        self.fuzzy_ids = list(self.stops)
+        self.fuzzy_choices = [normalize_stop_name(self.stops[stop_id].name) for stop_id in self.fuzzy_ids]
+        # One- and two-letter queries scan a large slice of the index, and there are few of them
+        self.short_suggestions = {}
+
+    @classmethod
+    def from_routes(cls, routes):
+        route_counts = {}
+        for route in routes:
+            for place in set(route.places):
+                route_counts[place] = route_counts.get(place, 0) + 1
+        return cls(route_counts)
+
+    def __len__(self):
+        return len(self.stops)
+
+    def resolve(self, name):
+        """Stop id for any known spelling of a stop, or None."""
+        if not name:
+            return None
+        stop_id = self.aliases.get(name.upper())
+        if stop_id is None:
+            stop_id = self.aliases.get(compact_key(normalize_stop_name(name)))
+        return stop_id
+
+    def get(self, name):
+        stop_id = self.resolve(name)
+        return self.stops[stop_id] if stop_id else None
+
+    def suggest(self, query, limit=10):
+        """Typeahead: up to `limit` stops whose spellings have a word starting with the query,
+        most-served first; when nothing matches, the closest spellings instead.
+
+        Returns [(StopEntry, 'prefix' | 'fuzzy'), ...].
+        """
+        prefix = query_tokens(query)
+        if not prefix:
+            return []
+        cache_key = (prefix, limit)
+        if len(prefix) <= 2 and cache_key in self.short_suggestions:
+            return self.short_suggestions[cache_key]
+
+        # Keys sharing the prefix are one contiguous run of the sorted index
+        start = bisect.bisect_left(self.prefix_keys, prefix)
+        end = bisect.bisect_left(self.prefix_keys, prefix + '\uffff', start)
+        matched = {stop_id for _, stop_id in self.prefix_index[start:end]}
+        if matched:
+            ranked = heapq.nsmallest(
+                limit, matched,
+                key=lambda stop_id: (-self.stops[stop_id].route_count, self.stops[stop_id].name),
+            )
+            suggestions = [(self.stops[stop_id], 'prefix') for stop_id in ranked]
+        else:
+            matches = process.extract(
+                normalize_stop_name(query), self.fuzzy_choices, scorer=fuzz.partial_ratio,
+                score_cutoff=SUGGEST_FUZZY_SCORE, limit=limit * 4,
+            )
+            ranked = sorted(matches, key=lambda match: (-match[1], -self.stops[self.fuzzy_ids[match[2]]].route_count))
+            suggestions = [(self.stops[self.fuzzy_ids[position]], 'fuzzy') for _, _, position in ranked[:limit]]
+
+        if len(prefix) <= 2:
+            self.short_suggestions[cache_key] = suggestions
+        return suggestions
@@ -0,0 +1,139 @@
+import csv
+import heapq
+import math
+import os
+import threading
+from crowd_report_service import haversine_m, EARTH_RADIUS_M
+
+DEFAULT_STOP_COORDINATES_CSV = os.path.join('data', 'stop_coordinates.csv')
+
+
+# Points are stored as unit vectors so straight-line (chord) distance orders
+# neighbours exactly like great-circle distance, without any projection error
+def to_unit_vector(lat, lng):
+    phi = math.radians(lat)
+    lam = math.radians(lng)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def chord_for_metres(metres):
+    return 2 * math.sin(min(metres / EARTH_RADIUS_M, math.pi) / 2)
+
+
+class KDTree:
+    def __init__(self, points):
+        self.points = points
+        self.root = self.build(list(range(len(points))), 0)
+
+    # Nodes are (point index, axis, left, right) tuples
+    def build(self, indices, depth):
+        if not indices:
+            return None
+        axis = depth % 3
+        indices.sort(key=lambda i: self.points[i][axis])
+        middle = len(indices) // 2
+        return (
+            indices[middle],
+            axis,
+            self.build(indices[:middle], depth + 1),
+            self.build(indices[middle + 1:], depth + 1),
+        )
+
+    def nearest(self, point, k, max_distance=None):
+        """Returns up to k (squared distance, point index) pairs, closest first."""
+        best = []  # max-heap of (-squared distance, index)
+        bound = max_distance ** 2 if max_distance is not None else math.inf
+
+        def search(node):
+            if node is None:
+                return
+            index, axis, left, right = node
+            candidate = self.points[index]
+            squared = sum((a - b) ** 2 for a, b in zip(point, candidate))
+            limit = -best[0][0] if len(best) == k else bound
+            if squared <= min(limit, bound):
+                heapq.heappush(best, (-squared, index))
+                if len(best) > k:
+                    heapq.heappop(best)
+
+            diff = point[axis] - candidate[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            search(near)
+            limit = -best[0][0] if len(best) == k else bound
+            if diff ** 2 <= limit:
+                search(far)
+
+        search(self.root)
+        return sorted((-negative, index) for negative, index in best)
+
+
+class StopLocationService:
+    def __init__(self, csv_path=None):
+        self.csv_path = csv_path or os.getenv('STOP_COORDINATES_CSV', DEFAULT_STOP_COORDINATES_CSV)
+        self.coordinates = {}  # upper-cased stop name -> (lat, lng)
+        # Re-entrant so ensure_joined can hold it across join_places
+        self.lock = threading.RLock()
+        # (stops, KD-tree over them) are replaced together, so a reader never pairs a
+        # tree with another join's stop list
+        self.joined = ([], None)
+        self.missing = []
+        self.index_version = None
+
+    @property
+    def stops(self):
+        return self.joined[0]
+
+    # CSV columns: name,lat,lng
+    def load_csv(self):
+        coordinates = {}
+        if os.path.isfile(self.csv_path):
+            with open(self.csv_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    try:
+                        name = row['name'].strip().upper()
+                        coordinates[name] = (float(row['lat']), float(row['lng']))
+                    except (KeyError, TypeError, ValueError, AttributeError):
+                        continue
+        self.coordinates = coordinates
+        return coordinates
+
+    # Joins the coordinate table to the stop names parsed from the timetables. Built aside
+    # and published in one assignment, so concurrent nearest_stops calls keep reading the
+    # previous join until this one is complete
+    def join_places(self, places, index_version=None):
+        coordinates = self.load_csv()
+        stops = []
+        missing = []
+        for place in sorted(set(places)):
+            coords = coordinates.get(place.strip().upper())
+            if coords:
+                stops.append({'name': place, 'lat': coords[0], 'lng': coords[1]})
+            else:
+                missing.append(place)
+        tree = KDTree([to_unit_vector(stop['lat'], stop['lng']) for stop in stops])
+        with self.lock:
+            self.joined = (stops, tree)
+            self.missing = missing
+            self.index_version = index_version
+        return stops
+
+    # Joins once per index version: the version is checked again under the lock, so the
+    # requests that arrive together after a rebuild do not each redo the join
+    def ensure_joined(self, index_version, get_places):
+        if self.index_version == index_version:
+            return
+        with self.lock:
+            if self.index_version != index_version:
+                self.join_places(get_places(), index_version)
+
+    def nearest_stops(self, lat, lng, k=5, radius_m=None):
+        stops, tree = self.joined
+        if not stops:
+            return []
+        max_chord = chord_for_metres(radius_m) if radius_m is not None else None
+        results = []
+        for _, index in tree.nearest(to_unit_vector(lat, lng), k, max_chord):
+            stop = stops[index]
+            distance = haversine_m(lat, lng, stop['lat'], stop['lng'])
+            results.append({**stop, 'distance_m': round(distance)})
+        return results
@@ -0,0 +1,101 @@
+import numpy as np
+from timetable_time import DAY_MASK_BITS, DayType, footnote_letters
+
+# A columnar view of every departure in the index: one row per (route, stop, departure).
+# Rows are sorted by (stop_id, minutes), so a stop's departures are one contiguous slice
+# and every board query is a slice plus a vectorized mask.
+
+# Timetables run past midnight as 24:xx/25:xx, so the open end of a window is the uint16 max
+LAST_MINUTE = np.iinfo(np.uint16).max
+
+
+class StopTimesTable:
+    def __init__(self, routes, catalog):
+        self.routes = routes
+        self.catalog = catalog
+        # Rows are keyed by canonical stop, so every spelling of a stop shares one slice
+        self.stop_keys = sorted(catalog.stops)
+        self.stop_ids = {key: stop_id for stop_id, key in enumerate(self.stop_keys)}
+
+        route_ids, stop_ids, minutes, flags = [], [], [], []
+        for route_id, route in enumerate(routes):
+            for name, record in route.stops.items():
+                count = len(record.minutes)
+                key = catalog.resolve(name)
+                if not count or key is None:
+                    continue
+                route_ids.append(np.full(count, route_id, dtype=np.int32))
+                stop_ids.append(np.full(count, self.stop_ids[key], dtype=np.int32))
+                minutes.append(np.frombuffer(record.minutes, dtype=np.uint16))
+                flags.append(np.asarray(record.flags, dtype=np.uint32))
+
+        if minutes:
+            route_id = np.concatenate(route_ids)
+            stop_id = np.concatenate(stop_ids)
+            minute = np.concatenate(minutes)
+            flag = np.concatenate(flags)
+        else:
+            route_id = stop_id = np.zeros(0, dtype=np.int32)
+            minute = np.zeros(0, dtype=np.uint16)
+            flag = np.zeros(0, dtype=np.uint32)
+
+        # The parser keeps each stop's departures sorted and de-duplicated rather than by
+        # timetable column, so this is only the departure's ordinal at its (route, stop), not a trip
+        sizes = [len(chunk) for chunk in minutes]
+        starts = np.repeat(np.cumsum([0] + sizes[:-1]), sizes) if sizes else np.zeros(0, dtype=np.int64)
+        departure_idx = (np.arange(len(minute)) - starts).astype(np.int32)
+
+        order = np.lexsort((minute, stop_id))
+        self.route_id = route_id[order]
+        self.stop_id = stop_id[order]
+        self.departure_idx = departure_idx[order]
+        self.minutes = minute[order]
+        self.day_mask = (flag[order] & DayType.ANY).astype(np.uint8)
+        self.footnotes = (flag[order] >> DAY_MASK_BITS).astype(np.uint32)
+        # stop_id -> [start, end) row range
+        self.offsets = np.searchsorted(self.stop_id, np.arange(len(self.stop_keys) + 1))
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def rows_for(self, stop_name, start_minutes=0, end_minutes=LAST_MINUTE, day_mask=DayType.ANY):
+        """Row indices of departures from a stop within [start, end] minutes on any of day_mask."""
+        stop_id = self.stop_ids.get(self.catalog.resolve(stop_name))
+        if stop_id is None:
+            return None
+        start, end = self.offsets[stop_id], self.offsets[stop_id + 1]
+        minutes = self.minutes[start:end]
+        # The slice is sorted by minutes, so the window itself is two binary searches
+        low = start + np.searchsorted(minutes, start_minutes, side='left')
+        high = start + np.searchsorted(minutes, end_minutes, side='right')
+        rows = np.arange(low, high)
+        return rows[(self.day_mask[low:high] & day_mask) != 0]
+
+    def departures(self, stop_name, start_minutes=0, end_minutes=LAST_MINUTE, day_mask=DayType.ANY, limit=50):
+        rows = self.rows_for(stop_name, start_minutes, end_minutes, day_mask)
+        if rows is None:
+            return None
+
+        per_route = np.bincount(self.route_id[rows], minlength=len(self.routes))
+        per_hour = np.bincount(self.minutes[rows] // 60, minlength=24)
+        board = []
+        for row in rows[:limit].tolist():
+            route = self.routes[self.route_id[row]]
+            minutes = int(self.minutes[row])
+            board.append({
+                'time': f"{minutes // 60:02d}:{minutes % 60:02d}",
+                'minutes': minutes,
+                'footnote': footnote_letters(int(self.footnotes[row])) or None,
+                'bus_route': route.getRouteName(),
+                'pdf': route.pdf,
+            })
+
+        return {
+            'total': int(len(rows)),
+            'departures': board,
+            'per_route': [
+                {'bus_route': self.routes[route_id].getRouteName(), 'pdf': self.routes[route_id].pdf, 'count': int(per_route[route_id])}
+                for route_id in np.argsort(-per_route, kind='stable')[:np.count_nonzero(per_route)].tolist()
+            ],
+            'per_hour': {f"{hour:02d}": int(count) for hour, count in enumerate(per_hour.tolist()) if count},
+        }
@@ -0,0 +1,108 @@
+import re
+from functools import lru_cache
+from datetime import timedelta, timezone
+from enum import IntFlag
+from typing import NamedTuple
+
+# Timetables are published in South African Standard Time (no DST)
+SAST = timezone(timedelta(hours=2))
+
+# e.g. '07:10bwd', '12:45 wsa', '20:00aw' -> hour, minute, footnote, day flag
+TIME_PATTERN = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*([a-vx-z])?\s*(wd|wsa|wsu|w)\s*$')
+CLOCK_PATTERN = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*$')
+
+
+class DayType(IntFlag):
+    WEEKDAY = 1
+    SATURDAY = 2
+    SUNDAY = 4
+    ANY = WEEKDAY | SATURDAY | SUNDAY
+
+
+# Suffixes PlaceMapService.flag_times appends; 'w' means no day header was seen
+DAY_FLAGS = {'wd': DayType.WEEKDAY, 'wsa': DayType.SATURDAY, 'wsu': DayType.SUNDAY, 'w': DayType.ANY}
+FLAG_FOR_DAY = {mask: flag for flag, mask in DAY_FLAGS.items()}
+# Packed form used by compact stores: day mask in the low bits, footnote bits above
+DAY_MASK_BITS = 3
+# Day names accepted by the query endpoints
+DAY_NAMES = {
+    'weekday': DayType.WEEKDAY, 'wd': DayType.WEEKDAY,
+    'saturday': DayType.SATURDAY, 'wsa': DayType.SATURDAY,
+    'sunday': DayType.SUNDAY, 'wsu': DayType.SUNDAY,
+    'any': DayType.ANY,
+}
+
+
+class TimetableTime(NamedTuple):
+    """A departure as integers: minutes after midnight, DayType mask and footnote bits."""
+    minutes: int
+    day_mask: int
+    footnotes: int = 0
+
+    @property
+    def clock(self):
+        return f"{self.minutes // 60:02d}:{self.minutes % 60:02d}"
+
+    @property
+    def footnote_letters(self):
+        return footnote_letters(self.footnotes)
+
+    # Legacy string form used by the JSON responses, e.g. '07:10bwd' or '12:45 wsa'
+    def legacy(self):
+        return legacy_string(self)
+
+
+# Footnote letters ('a' - Mondays to Thursdays, 'b' - Fridays, ...) as bits: a=1, b=2, c=4
+def footnote_bit(letter):
+    return 1 << (ord(letter) - ord('a'))
+
+
+def footnote_letters(bits):
+    if not bits:
+        return ''
+    return ''.join(chr(ord('a') + i) for i in range(26) if bits & (1 << i))
+
+
+# Timetables reuse a small vocabulary of time strings, so both directions are memoized
+@lru_cache(maxsize=65536)
+def legacy_string(encoded):
+    return f"{encoded.clock}{encoded.footnote_letters or ' '}{FLAG_FOR_DAY.get(encoded.day_mask, 'w')}"
+
+
+@lru_cache(maxsize=65536)
+def parse_time(raw):
+    """Encodes a flagged time string; returns None for placeholders like '--' or 'via'."""
+    match = TIME_PATTERN.match(raw)
+    if not match:
+        return None
+    hour, minute, footnote, flag = match.groups()
+    return TimetableTime(
+        int(hour) * 60 + int(minute),
+        int(DAY_FLAGS[flag]),
+        footnote_bit(footnote) if footnote else 0,
+    )
+
+
+# Minutes after midnight for a plain 'HH:MM' query time; None unless it is a time of day
+def clock_to_minutes(text):
+    match = CLOCK_PATTERN.match(text) if isinstance(text, str) else None
+    if not match:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def day_mask_for(moment):
+    weekday = moment.weekday()
+    if weekday < 5:
+        return DayType.WEEKDAY
+    return DayType.SATURDAY if weekday == 5 else DayType.SUNDAY
+
+
+# DayType for a ?day= value; 'today' (or nothing) means the day type of `moment`
+def parse_day_type(text, moment):
+    if not text or text.lower() == 'today':
+        return day_mask_for(moment)
+    return DAY_NAMES.get(text.lower())